@@ -0,0 +1,209 @@
+"""NongoFit - live workout aggregation.
+
+`Aggregator` consumes treadmill states as they are decoded and keeps running
+workout statistics up to date in constant (amortized) time per sample, so
+nothing has to be recomputed from the output file after the workout:
+
+  * rolling pace and pulse averages over configurable windows (in seconds)
+  * per-mile and per-kilometer splits
+  * cumulative elevation gain, from incline x distance travelled
+  * time spent in each pace zone
+
+Example usage:
+
+    aggregator = aggregator.Aggregator(windows=(30, 300))
+    for response_data in reader.responses():
+        response = responses.parse_response(response_data)
+        if response.type == responses.ResponseTypes.TREADMILL_STATE:
+            aggregator.update(response)
+    print(aggregator.summary_line())
+    print(aggregator.mile_splits)
+"""
+
+import bisect
+import collections
+
+# Distances are reported in miles (see `responses.distance_from_int`), which
+# uses the same factor.
+_KILOMETERS_PER_MILE = 1 / 0.621
+_FEET_PER_MILE = 5280
+
+# Pace zones as (lower bound in mph, name), in increasing order of pace.
+DEFAULT_PACE_ZONES = (
+    (0.0, "stopped"),
+    (0.5, "walk"),
+    (4.0, "jog"),
+    (6.0, "run"),
+)
+
+
+class RollingAverage:
+    """Average of the values seen over the last `window` seconds.
+
+    Values are expected in increasing order of time. Each value is added and
+    removed exactly once, so updates are O(1) amortized.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._values = collections.deque()
+        self._sum = 0.0
+
+    def add(self, timestamp: float, value: float):
+        values = self._values
+        values.append((timestamp, value))
+        self._sum += value
+        while timestamp - values[0][0] >= self.window:
+            self._sum -= values.popleft()[1]
+
+    def reset(self):
+        self._values.clear()
+        self._sum = 0.0
+
+    @property
+    def average(self) -> float:
+        if not self._values:
+            return 0.0
+        return self._sum / len(self._values)
+
+
+class Aggregator:
+    """Incrementally aggregates treadmill states into workout statistics.
+
+    A timer that goes backwards (e.g. a new workout started on the treadmill)
+    starts a new segment: totals carry on, but no time or distance is
+    attributed to the jump.
+
+    Args:
+      windows: lengths (in seconds) of the rolling average windows.
+      pace_zones: (lower bound in mph, name) pairs in increasing order.
+    """
+
+    def __init__(self, windows: tuple = (30, 300), pace_zones=DEFAULT_PACE_ZONES):
+        self._pace_averages = {window: RollingAverage(window) for window in windows}
+        self._pulse_averages = {window: RollingAverage(window) for window in windows}
+
+        self._zone_bounds = [bound for bound, _ in pace_zones]
+        self._zone_names = [name for _, name in pace_zones]
+        # Seconds spent in each zone, by name.
+        self.zone_time = dict.fromkeys(self._zone_names, 0)
+
+        self.samples = 0
+        # Totals across segments.
+        self.elapsed = 0
+        self.distance = 0.0
+        self.elevation_gain = 0.0
+
+        # Split times in seconds.
+        self.mile_splits = []
+        self.kilometer_splits = []
+        self._mile_start = 0
+        self._kilometer_start = 0
+
+        self._last = None
+
+    def update(self, response):
+        """Adds a `TreadmillStateResponse` to the aggregates."""
+        self.samples += 1
+        timer = response.timer
+        pace = response.pace
+
+        for average in self._pace_averages.values():
+            average.add(timer, pace)
+        if response.pulse_enabled:
+            for average in self._pulse_averages.values():
+                average.add(timer, response.pulse)
+
+        last = self._last
+        self._last = (timer, response.distance, pace)
+        if last is None:
+            return
+
+        last_timer, last_distance, last_pace = last
+        elapsed = timer - last_timer
+        travelled = response.distance - last_distance
+        if elapsed < 0 or travelled < 0:
+            # New segment; the rolling windows restart with it.
+            for average in self._pace_averages.values():
+                average.reset()
+                average.add(timer, pace)
+            for average in self._pulse_averages.values():
+                average.reset()
+            return
+
+        # Attribute the interval to the pace it was travelled at.
+        zone = self._zone_names[
+            max(bisect.bisect_right(self._zone_bounds, last_pace) - 1, 0)
+        ]
+        self.zone_time[zone] += elapsed
+
+        start_elapsed = self.elapsed
+        start_distance = self.distance
+        self.elapsed += elapsed
+        self.distance += travelled
+        # Incline is rise over run, in percent.
+        self.elevation_gain += travelled * _FEET_PER_MILE * response.incline / 100
+
+        if travelled:
+            self._update_splits(start_elapsed, start_distance, elapsed, travelled)
+
+    def _update_splits(self, start_elapsed, start_distance, elapsed, travelled):
+        """Records splits completed within the latest interval.
+
+        The time at which a split boundary was crossed is interpolated within
+        the interval.
+        """
+
+        def crossing(distance):
+            return start_elapsed + elapsed * (distance - start_distance) / travelled
+
+        while self.distance >= len(self.mile_splits) + 1:
+            split_end = crossing(len(self.mile_splits) + 1)
+            self.mile_splits.append(split_end - self._mile_start)
+            self._mile_start = split_end
+
+        kilometers = self.distance * _KILOMETERS_PER_MILE
+        while kilometers >= len(self.kilometer_splits) + 1:
+            kilometer = len(self.kilometer_splits) + 1
+            split_end = crossing(kilometer / _KILOMETERS_PER_MILE)
+            self.kilometer_splits.append(split_end - self._kilometer_start)
+            self._kilometer_start = split_end
+
+    def pace_average(self, window: float) -> float:
+        """Average pace (mph) over the last `window` seconds."""
+        return self._pace_averages[window].average
+
+    def pulse_average(self, window: float) -> float:
+        """Average pulse (bpm) over the last `window` seconds, if available."""
+        return self._pulse_averages[window].average
+
+    def summary_line(self) -> str:
+        """Summarizes the aggregates on a single line."""
+        spacer = " " * 4
+        averages = spacer.join(
+            f"{window}s avg {self.pace_average(window):.1f} mph"
+            + (f" {pulse:.0f} bpm" if (pulse := self.pulse_average(window)) else "")
+            for window in self._pace_averages
+        )
+        zones = " ".join(
+            f"{name}:{seconds}s" for name, seconds in self.zone_time.items() if seconds
+        )
+        splits = ""
+        if self.mile_splits:
+            splits = (
+                f"{spacer}mile {len(self.mile_splits)} in "
+                f"{_format_duration(self.mile_splits[-1])}"
+            )
+        return (
+            f"(Summary){spacer}"
+            f"{self.distance:.3f} miles in {_format_duration(self.elapsed)}{spacer}"
+            f"{self.elevation_gain:.0f} ft gained{spacer}"
+            f"{averages}{spacer}"
+            f"zones [{zones}]"
+            f"{splits}"
+        )
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    return f"{minutes}:{seconds:02}"
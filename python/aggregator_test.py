@@ -0,0 +1,66 @@
+import aggregator
+import unittest
+
+
+class _State:
+    """Stand-in for a `TreadmillStateResponse`."""
+
+    def __init__(self, timer, distance, pace=6.0, incline=0.0, pulse=0):
+        self.timer = timer
+        self.distance = distance
+        self.pace = pace
+        self.incline = incline
+        self.pulse = pulse
+        self.pulse_enabled = bool(pulse)
+
+
+class AggregatorTest(unittest.TestCase):
+    def test_rolling_average(self):
+        average = aggregator.RollingAverage(window=3)
+        for timestamp, value in enumerate((1, 2, 3, 4, 5)):
+            average.add(timestamp, value)
+        self.assertEqual(average.average, 4)
+
+    def test_rolling_windows(self):
+        workout = aggregator.Aggregator(windows=(2, 10))
+        for timer, pace in enumerate((2.0, 4.0, 6.0, 8.0)):
+            workout.update(_State(timer, timer * 0.01, pace=pace, pulse=100 + timer))
+
+        self.assertEqual(workout.pace_average(2), 7.0)
+        self.assertEqual(workout.pace_average(10), 5.0)
+        self.assertEqual(workout.pulse_average(2), 102.5)
+
+    def test_splits(self):
+        workout = aggregator.Aggregator()
+        # 6 mph: a mile every 600 seconds.
+        for timer in range(0, 1300, 100):
+            workout.update(_State(timer, timer / 600))
+
+        self.assertEqual(len(workout.mile_splits), 2)
+        for split in workout.mile_splits:
+            self.assertAlmostEqual(split, 600)
+        self.assertEqual(len(workout.kilometer_splits), 3)
+        self.assertAlmostEqual(workout.kilometer_splits[0], 600 * 0.621)
+        self.assertEqual(
+            workout.zone_time, {"stopped": 0, "walk": 0, "jog": 0, "run": 1200}
+        )
+
+    def test_elevation_gain(self):
+        workout = aggregator.Aggregator()
+        workout.update(_State(0, 0.0, incline=10.0))
+        workout.update(_State(60, 0.1, incline=10.0))
+        self.assertAlmostEqual(workout.elevation_gain, 52.8)
+
+    def test_timer_reset(self):
+        workout = aggregator.Aggregator()
+        workout.update(_State(0, 0.0))
+        workout.update(_State(100, 0.2))
+        workout.update(_State(0, 0.0))
+        workout.update(_State(50, 0.1))
+
+        self.assertEqual(workout.elapsed, 150)
+        self.assertAlmostEqual(workout.distance, 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
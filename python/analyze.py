@@ -0,0 +1,278 @@
+#!/usr/bin/python3
+"""NongoFit - capture analysis for reverse-engineering unknown fields.
+
+Loads every frame of a capture into a NumPy matrix (one row per frame, one
+column per byte offset) and summarizes each byte offset of the treadmill
+state payload:
+
+  * variance of the byte's value
+  * change frequency: how often the byte differs from the previous frame
+  * correlation with the known pace, incline and timer columns
+
+Bytes that never change can be ignored, bytes that change on every frame are
+likely counters, and bytes that correlate with a known column are likely part
+of (or derived from) it. Frames of other types are grouped by type code, with
+counts, so unknown responses can be found without scrolling hex dumps.
+
+Usage:
+    ./analyze.py packets.ngfc
+
+Requires NumPy.
+"""
+
+import argparse
+import array
+import batch_responses
+import captures
+import collections
+import numpy as np
+import packet_reader
+import producers
+import responses
+
+# Bytes preceding the payload: device info then the type code.
+_PREFIX_SIZE = 7
+
+# Known columns correlated with each byte offset.
+CORRELATED_FIELDS = ("pace", "incline", "timer")
+
+
+def frame_matrix(frames) -> tuple:
+    """Stacks `frames` into a zero-padded matrix.
+
+    Args:
+      frames: iterable of frames; they are copied, so views of a reused
+        buffer (e.g. from `PacketReader.responses()`) are fine.
+
+    Returns:
+      The (frames x bytes) uint8 matrix, and the length of each frame.
+    """
+    data = bytearray()
+    lengths = array.array("I")
+    for frame in frames:
+        data += frame
+        lengths.append(len(frame))
+
+    lengths = np.frombuffer(lengths, dtype=np.uint32).astype(np.int64)
+    return _scatter_rows(np.frombuffer(data, dtype=np.uint8), lengths), lengths
+
+
+def _scatter_rows(flat: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Splits `flat` into rows of `lengths` bytes, zero-padded to the longest."""
+    width = int(lengths.max()) if len(lengths) else 0
+    if (lengths == width).all():
+        return flat.reshape(len(lengths), width)
+
+    starts = np.cumsum(lengths) - lengths
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    columns = np.arange(len(flat)) - np.repeat(starts, lengths)
+    matrix = np.zeros((len(lengths), width), dtype=np.uint8)
+    matrix[rows, columns] = flat
+    return matrix
+
+
+def frame_packets(packets: np.ndarray) -> tuple:
+    """Reassembles frames from a (packets x bytes) matrix without a loop.
+
+    Produces the same frames as a resyncing `PacketReader`, but only handles
+    clean sequences: every packet from the first header onwards must belong
+    to a well-formed frame (a trailing incomplete frame is ignored).
+
+    Returns:
+      A `frame_matrix` style (matrix, lengths) tuple, or None if the packets
+      need the `PacketReader`'s recovery logic.
+    """
+    num_packets, packet_size = packets.shape
+    first = packets[:, 0]
+    headers = np.flatnonzero((first == 0xFE) & (packets[:, 1] == 0x02))
+    if not len(headers) or packet_size < 4:
+        return None
+
+    counts = packets[headers, 3].astype(np.int64)
+    ends = headers + counts
+    # Frames must be back to back (no stray packets in between).
+    if (counts < 2).any() or (ends[:-1] != headers[1:]).any():
+        return None
+    complete = ends <= num_packets
+    headers, counts = headers[complete], counts[complete]
+    if not len(headers):
+        return None
+    packets = packets[headers[0] : headers[-1] + counts[-1]]
+    first = packets[:, 0]
+
+    # Position of each packet within its frame.
+    position = np.arange(len(packets)) - np.repeat(headers - headers[0], counts)
+    is_end = position == np.repeat(counts - 1, counts)
+    is_middle = (position > 0) & ~is_end
+    if (first[is_middle] != position[is_middle] - 1).any():
+        return None
+    if (first[is_end] != 0xFF).any():
+        return None
+
+    end_sizes = packets[is_end, 1].astype(np.int64)
+    lengths = (counts - 2) * (packet_size - 2) + end_sizes - 1
+    if (end_sizes < 1).any() or (end_sizes + 1 > packet_size).any():
+        return None
+    if (lengths > packets[position == 0, 2]).any():
+        return None
+
+    # Data bytes: everything after the two metadata bytes of intermediate
+    # packets, and the declared size of end packets.
+    columns = np.arange(packet_size)
+    take = np.zeros(packets.shape, dtype=bool)
+    take[is_middle, 2:] = True
+    take[is_end] = (columns >= 2) & (columns[None, :] < end_sizes[:, None] + 1)
+    return _scatter_rows(packets[take], lengths), lengths
+
+
+def load_capture(path: str) -> tuple:
+    """Reads every frame of the capture at `path` into a `frame_matrix`.
+
+    Clean binary captures are reassembled with `frame_packets`; anything else
+    goes through a `PacketReader`.
+    """
+    if captures.is_binary_capture(path):
+        with captures.CaptureReader(path) as reader:
+            buffer, record_size, packet_offset = reader.records()
+            records = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, record_size)
+            packets = records[:, packet_offset : packet_offset + reader.packet_size]
+            result = frame_packets(packets)
+            # Don't keep the mapping alive through views of it.
+            del buffer, records, packets
+            if result is not None:
+                matrix, lengths = result
+                return matrix.copy(), lengths
+
+    with producers.file_producer(path) as producer:
+        reader = packet_reader.PacketReader(producer, resync=True)
+        return frame_matrix(reader.responses())
+
+
+def type_codes(matrix: np.ndarray) -> np.ndarray:
+    """Type code of each frame (see `responses.parse_response`)."""
+    if matrix.shape[1] < _PREFIX_SIZE:
+        matrix = np.pad(matrix, ((0, 0), (0, _PREFIX_SIZE - matrix.shape[1])))
+    return np.ascontiguousarray(matrix[:, 3:_PREFIX_SIZE]).view("<u4").ravel()
+
+
+def _correlation(matrix: np.ndarray, column: np.ndarray) -> np.ndarray:
+    """Pearson correlation of every column of `matrix` with `column`.
+
+    Constant columns have no defined correlation and yield NaN.
+    """
+    centered = matrix - matrix.mean(axis=0)
+    column = column - column.mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (centered * column[:, None]).sum(axis=0) / (
+            np.sqrt((centered**2).sum(axis=0)) * np.sqrt((column**2).sum())
+        )
+
+
+def analyze_payloads(matrix: np.ndarray) -> dict:
+    """Per-offset statistics of treadmill state payloads.
+
+    Args:
+      matrix: frame matrix of treadmill state frames only.
+
+    Returns:
+      A dict of arrays indexed by payload offset: `variance`, `change_rate`,
+      `known` (the mapped field covering the offset, or '') and one
+      correlation per `CORRELATED_FIELDS` entry.
+    """
+    payload = matrix[:, _PREFIX_SIZE:].astype(np.float64)
+    states = batch_responses.decode_treadmill_states(
+        matrix.tobytes(), frame_size=matrix.shape[1]
+    )
+
+    known = [""] * payload.shape[1]
+    for field in responses.TreadmillStateResponse._SCHEMA.fields:
+        for offset in range(field.offset, min(field.offset + field.size, len(known))):
+            known[offset] = field.name
+
+    if len(payload) > 1:
+        change_rate = (payload[1:] != payload[:-1]).mean(axis=0)
+    else:
+        change_rate = np.zeros(payload.shape[1])
+
+    results = {
+        "variance": payload.var(axis=0),
+        "change_rate": change_rate,
+        "known": known,
+    }
+    for name in CORRELATED_FIELDS:
+        results[name] = _correlation(payload, states[name].astype(np.float64))
+    return results
+
+
+def group_by_type(matrix: np.ndarray, lengths: np.ndarray) -> list:
+    """Summarizes frames by type code.
+
+    Returns:
+      (type code, frame count, distinct payloads, frame lengths, example frame
+      hex) tuples, most frequent first.
+    """
+    codes = type_codes(matrix)
+    groups = []
+    unique_codes, counts = np.unique(codes, return_counts=True)
+    for code, count in sorted(zip(unique_codes, counts), key=lambda group: -group[1]):
+        indices = np.flatnonzero(codes == code)
+        rows = np.ascontiguousarray(matrix[indices])
+        # Compare whole rows as single opaque values (much faster than
+        # `np.unique(..., axis=0)`).
+        distinct = len(np.unique(rows.view(f"V{rows.shape[1]}")))
+        frame_lengths = collections.Counter(lengths[indices].tolist())
+        example = bytes(rows[0, : lengths[indices[0]]]).hex()
+        groups.append((int(code), int(count), distinct, frame_lengths, example))
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize the bytes of a capture to help map unknown fields"
+    )
+    parser.add_argument("input_file", help="Hex or binary capture")
+    parser.add_argument(
+        "--all_offsets",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Whether to include offsets that never change",
+    )
+    args = parser.parse_args()
+
+    matrix, lengths = load_capture(args.input_file)
+    if not len(matrix):
+        print("No frames found")
+        return
+
+    print(f"{len(matrix)} frames\n")
+
+    print("Type code    Frames  Distinct  Lengths       Example")
+    for code, count, distinct, frame_lengths, example in group_by_type(
+        matrix, lengths
+    ):
+        name = " (treadmill state)" if code == responses.TREADMILL_STATE_CODE else ""
+        sizes = ",".join(str(size) for size in sorted(frame_lengths))
+        print(f"{code:#010x} {count:>8} {distinct:>9}  {sizes:<12}  {example}{name}")
+
+    states = matrix[type_codes(matrix) == responses.TREADMILL_STATE_CODE]
+    if not len(states):
+        return
+
+    results = analyze_payloads(states)
+    header = "".join(f"{name:>9}" for name in CORRELATED_FIELDS)
+    print(f"\nTreadmill state payload ({len(states)} frames):")
+    print(f"Offset  Known          Variance  Changes{header}")
+    for offset, known in enumerate(results["known"]):
+        if not args.all_offsets and not results["variance"][offset]:
+            continue
+        correlations = "".join(
+            f"{results[name][offset]:>9.2f}" for name in CORRELATED_FIELDS
+        )
+        print(
+            f"{offset:>6}  {known:<13} {results['variance'][offset]:>9.1f} "
+            f"{results['change_rate'][offset]:>7.1%}{correlations}"
+        )
+
+
+if __name__ == "__main__":
+    main()
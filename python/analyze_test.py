@@ -0,0 +1,137 @@
+import os
+import packet_reader
+import responses
+import tempfile
+import unittest
+
+try:
+    import analyze
+    import captures
+    import numpy as np
+except ImportError:  # NumPy is optional.
+    analyze = None
+
+# Full treadmill state frame (device info, type and payload).
+_STATE_FRAME = bytes.fromhex(
+    "0104022e042e0202c1002c0171006a17000000000000025502250b00009112a203b4005d"
+    "0128015802ec022000ec022000"
+)
+_OTHER_FRAME = bytes.fromhex("010402340200000102030405")
+
+
+def _state_frame(pace, counter):
+    frame = bytearray(_STATE_FRAME)
+    frame[8:10] = pace.to_bytes(2, "little")
+    # Unmapped byte that changes on every frame.
+    frame[40] = counter % 256
+    return bytes(frame)
+
+
+def _packets(frame, sequence=0):
+    """Splits `frame` into packets, as sent by the treadmill."""
+    chunks = [frame[start : start + 18] for start in range(0, len(frame), 18)]
+    packets = [bytes([0xFE, 0x02, len(frame), len(chunks) + 1, sequence])]
+    for index, chunk in enumerate(chunks[:-1]):
+        packets.append(bytes([index, 0x12]) + chunk)
+    packets.append(bytes([0xFF, len(chunks[-1]) + 1]) + chunks[-1])
+    return [packet.ljust(20, b"\x00") for packet in packets]
+
+
+@unittest.skipIf(analyze is None, "NumPy is not installed")
+class AnalyzeTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self._frames = [_state_frame(800 + index % 50, index) for index in range(200)]
+        self._frames[10:10] = [_OTHER_FRAME, _OTHER_FRAME]
+
+    def _write_capture(self, packets):
+        path = os.path.join(self._directory.name, "packets.ngfc")
+        with open(path, "wb") as capture_file:
+            writer = captures.CaptureWriter(capture_file)
+            for packet in packets:
+                writer.write(packet)
+        return path
+
+    def _reader_matrix(self, path):
+        with analyze.producers.file_producer(path) as producer:
+            reader = packet_reader.PacketReader(producer, resync=True)
+            return analyze.frame_matrix(reader.responses())
+
+    def test_frame_matrix(self):
+        matrix, lengths = analyze.frame_matrix(self._frames)
+        self.assertEqual(matrix.shape, (len(self._frames), len(_STATE_FRAME)))
+        self.assertEqual(lengths[10], len(_OTHER_FRAME))
+        self.assertEqual(bytes(matrix[10, : lengths[10]]), _OTHER_FRAME)
+        self.assertFalse(matrix[10, lengths[10] :].any())
+        self.assertEqual(bytes(matrix[0]), self._frames[0])
+
+    def test_fast_path_matches_reader(self):
+        # Leading packets of a partial frame, and a trailing incomplete frame.
+        packets = _packets(_STATE_FRAME)[2:]
+        for frame in self._frames:
+            packets.extend(_packets(frame))
+        packets.extend(_packets(_STATE_FRAME)[:2])
+        path = self._write_capture(packets)
+
+        result = analyze.frame_packets(
+            np.frombuffer(b"".join(packets), dtype=np.uint8).reshape(-1, 20)
+        )
+        self.assertIsNotNone(result)
+        matrix, lengths = analyze.load_capture(path)
+        expected_matrix, expected_lengths = self._reader_matrix(path)
+        np.testing.assert_array_equal(matrix, expected_matrix)
+        np.testing.assert_array_equal(lengths, expected_lengths)
+        np.testing.assert_array_equal(result[0], expected_matrix)
+
+    def test_falls_back_to_reader(self):
+        packets = []
+        for frame in self._frames:
+            packets.extend(_packets(frame))
+        # Lose a packet in the middle of a frame.
+        del packets[21]
+        path = self._write_capture(packets)
+
+        self.assertIsNone(
+            analyze.frame_packets(
+                np.frombuffer(b"".join(packets), dtype=np.uint8).reshape(-1, 20)
+            )
+        )
+        matrix, lengths = analyze.load_capture(path)
+        expected_matrix, expected_lengths = self._reader_matrix(path)
+        np.testing.assert_array_equal(matrix, expected_matrix)
+        np.testing.assert_array_equal(lengths, expected_lengths)
+        self.assertEqual(len(matrix), len(self._frames) - 1)
+
+    def test_analyze_payloads(self):
+        matrix, _ = analyze.frame_matrix(self._frames)
+        states = matrix[analyze.type_codes(matrix) == responses.TREADMILL_STATE_CODE]
+        results = analyze.analyze_payloads(states)
+
+        # Offsets are relative to the payload (after the 7 byte prefix).
+        pace_offset = 8 - 7
+        counter_offset = 40 - 7
+        self.assertEqual(results["known"][pace_offset], "pace")
+        self.assertGreater(results["pace"][pace_offset], 0.9)
+        self.assertEqual(results["change_rate"][counter_offset], 1.0)
+        self.assertEqual(results["known"][counter_offset], "")
+        # Constant bytes.
+        self.assertEqual(results["variance"][0], 0)
+        self.assertEqual(results["change_rate"][0], 0)
+
+    def test_group_by_type(self):
+        matrix, lengths = analyze.frame_matrix(self._frames)
+        groups = analyze.group_by_type(matrix, lengths)
+
+        self.assertEqual(
+            [(code, count) for code, count, *_ in groups],
+            [(responses.TREADMILL_STATE_CODE, 200), (0x234, 2)],
+        )
+        _, _, distinct, frame_lengths, example = groups[1]
+        self.assertEqual(distinct, 1)
+        self.assertEqual(frame_lengths, {len(_OTHER_FRAME): 2})
+        self.assertEqual(example, _OTHER_FRAME.hex())
+
+
+if __name__ == "__main__":
+    unittest.main()
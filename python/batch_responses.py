@@ -0,0 +1,153 @@
+"""NongoFit - batch response decoding.
+
+Decodes many reassembled frames at once into NumPy columns. This is the
+offline counterpart to `responses.parse_response`: rather than building a
+`TreadmillStateResponse` per frame, the frames are viewed as a structured array
+laid out like the response's `Schema` and every field is converted with a
+single vectorized operation.
+
+Example usage:
+
+    # Decode every treadmill state frame in a capture.
+    with producers.FilePacketProducer('packets.txt') as packet_producer:
+        reader = packet_reader.PacketReader(packet_producer, copy=True)
+        states = batch_responses.decode_treadmill_states(reader.responses())
+
+    print(states["pace"].mean(), states["distance"].max())
+
+Requires NumPy.
+"""
+
+import functools
+
+import numpy as np
+
+import responses
+
+# Number of bytes preceding the payload: three bytes of device info followed by
+# the four-byte response type (see `responses.parse_response`).
+_PREFIX_SIZE = 7
+
+# NumPy types for the raw little-endian fields, keyed by `struct` format.
+_RAW_TYPES = {"B": "u1", "H": "<u2", "I": "<u4"}
+
+_SCHEMA = responses.TreadmillStateResponse._SCHEMA
+
+# Decoded output, one row per treadmill state frame.
+STATE_DTYPE = np.dtype(
+    [
+        ("pace", "f8"),
+        ("incline", "f8"),
+        ("distance", "f8"),
+        ("timer", "i4"),
+        ("pulse", "u1"),
+        ("pulse_enabled", "?"),
+    ]
+)
+
+
+def raw_state_dtype(frame_size: int) -> np.dtype:
+    """Builds a structured dtype mirroring the `TreadmillStateResponse` schema.
+
+    Each schema field becomes a field at its offset within the full frame (i.e.
+    including the device info/type prefix), plus a `type_code` field used to
+    pick out treadmill state frames.
+
+    Args:
+      frame_size: size of a single frame in bytes; becomes the itemsize.
+    """
+    names = ["type_code"]
+    formats = [_RAW_TYPES["I"]]
+    offsets = [3]
+    for field in _SCHEMA.fields:
+        names.append(field.name)
+        formats.append(_RAW_TYPES[field.format])
+        offsets.append(_PREFIX_SIZE + field.offset)
+
+    return np.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": frame_size,
+        }
+    )
+
+
+# Smallest frame that holds every known field.
+_MIN_FRAME_SIZE = _PREFIX_SIZE + _SCHEMA.size
+
+
+@functools.cache
+def _lookup_table(convert) -> np.ndarray:
+    """Builds a table of `convert` applied to every possible two-byte value.
+
+    Using the scalar conversion for every input (rather than re-implementing it
+    with NumPy arithmetic) guarantees the batch path rounds exactly like
+    `TreadmillStateResponse` does.
+    """
+    return np.array([convert(value) for value in range(1 << 16)], dtype="f8")
+
+
+def _to_buffer(frames, frame_size):
+    """Normalizes `frames` into a single contiguous buffer and frame size."""
+    if isinstance(frames, (bytes, bytearray, memoryview, np.ndarray)):
+        if not frame_size:
+            raise ValueError("A frame_size is required for a contiguous buffer")
+        return frames, frame_size
+
+    frames = list(frames)
+    sizes = {len(frame) for frame in frames}
+    if len(sizes) == 1:
+        return b"".join(frames), sizes.pop()
+
+    # Mixed sizes: trim/pad everything to the smallest size holding all fields.
+    # Missing bytes decode as zero, matching `int.from_bytes` on a short slice.
+    return (
+        b"".join(
+            bytes(frame[:_MIN_FRAME_SIZE]).ljust(_MIN_FRAME_SIZE, b"\0")
+            for frame in frames
+        ),
+        _MIN_FRAME_SIZE,
+    )
+
+
+def decode_treadmill_states(frames, frame_size: int = None) -> np.ndarray:
+    """Decodes the treadmill state frames in `frames`.
+
+    Frames that are not treadmill state responses are skipped.
+
+    Args:
+      frames: either an iterable of reassembled frames (as yielded by a
+        `PacketReader` with `copy=True`) or a single contiguous buffer of
+        equally sized frames.
+      frame_size: size of each frame; required when `frames` is a buffer.
+
+    Returns:
+      A structured array of `STATE_DTYPE`, one row per treadmill state frame.
+    """
+    buffer, frame_size = _to_buffer(frames, frame_size)
+    if len(buffer) % frame_size:
+        raise ValueError(
+            f"Buffer of {len(buffer)} bytes is not a whole number of "
+            f"{frame_size}-byte frames"
+        )
+
+    if frame_size < _MIN_FRAME_SIZE:
+        # Too short to hold every field; zero-pad each frame so the missing
+        # fields decode as zero.
+        matrix = np.frombuffer(buffer, dtype="u1").reshape(-1, frame_size)
+        buffer = np.pad(matrix, ((0, 0), (0, _MIN_FRAME_SIZE - frame_size)))
+        frame_size = _MIN_FRAME_SIZE
+
+    raw = np.frombuffer(buffer, dtype=raw_state_dtype(frame_size))
+    raw = raw[raw["type_code"] == responses.TREADMILL_STATE_CODE]
+
+    states = np.empty(len(raw), dtype=STATE_DTYPE)
+    states["pace"] = _lookup_table(responses.pace_from_int)[raw["pace"]]
+    states["incline"] = _lookup_table(responses.incline_from_int)[raw["incline"]]
+    states["distance"] = _lookup_table(responses.distance_from_int)[raw["distance"]]
+    states["timer"] = raw["timer"]
+    states["pulse"] = raw["pulse"]
+    states["pulse_enabled"] = raw["pulse_enabled"] != 0
+    return states
@@ -0,0 +1,80 @@
+import responses
+import unittest
+
+try:
+    import batch_responses
+except ImportError:  # NumPy is optional.
+    batch_responses = None
+
+# Full treadmill state frame (device info, type and payload).
+_STATE_FRAME = bytes.fromhex(
+    "0104022e042e0202c1002c0171006a17000000000000025502250b00009112a203b4005d"
+    "0128015802ec022000ec022000"
+)
+
+
+def _state_frame(pace, incline, distance, timer):
+    """Builds a treadmill state frame with the given raw values."""
+    frame = bytearray(_STATE_FRAME)
+    frame[8:10] = pace.to_bytes(2, "little")
+    frame[10:12] = incline.to_bytes(2, "little")
+    frame[14:16] = distance.to_bytes(2, "little")
+    frame[25:27] = timer.to_bytes(2, "little")
+    return bytes(frame)
+
+
+@unittest.skipIf(batch_responses is None, "NumPy is not installed")
+class BatchResponsesTest(unittest.TestCase):
+    def assertMatchesScalar(self, frames, states):
+        expected = [
+            response
+            for frame in frames
+            if (response := responses.parse_response(frame)).type
+            == responses.ResponseTypes.TREADMILL_STATE
+        ]
+        self.assertEqual(len(states), len(expected))
+        for row, response in zip(states, expected):
+            self.assertEqual(row["pace"], response.pace)
+            self.assertEqual(row["incline"], response.incline)
+            self.assertEqual(row["distance"], response.distance)
+            self.assertEqual(row["timer"], response.timer)
+            self.assertEqual(row["pulse"], response.pulse)
+            self.assertEqual(row["pulse_enabled"], response.pulse_enabled)
+
+    def test_matches_scalar_path(self):
+        frames = [
+            _state_frame(pace, incline, distance, timer)
+            for pace, incline, distance, timer in [
+                (0, 0, 0, 0),
+                (805, 150, 1234, 61),
+                (1931, 1000, 65535, 65535),
+                (965, 45, 4021, 1800),
+            ]
+        ]
+        self.assertMatchesScalar(
+            frames, batch_responses.decode_treadmill_states(frames)
+        )
+
+    def test_contiguous_buffer(self):
+        frames = [_state_frame(pace, 0, pace, pace) for pace in range(0, 3000, 7)]
+        states = batch_responses.decode_treadmill_states(
+            b"".join(frames), frame_size=len(_STATE_FRAME)
+        )
+        self.assertMatchesScalar(frames, states)
+
+    def test_skips_unknown_frames(self):
+        unknown = bytes.fromhex("0104022e0400000102")
+        frames = [unknown, _state_frame(805, 150, 1234, 61), unknown]
+        states = batch_responses.decode_treadmill_states(frames)
+        self.assertMatchesScalar(frames, states)
+        self.assertEqual(len(states), 1)
+
+    def test_partial_buffer(self):
+        with self.assertRaises(ValueError):
+            batch_responses.decode_treadmill_states(
+                _STATE_FRAME + b"\x00", frame_size=len(_STATE_FRAME)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
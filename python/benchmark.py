@@ -0,0 +1,416 @@
+#!/usr/bin/python3
+"""NongoFit benchmarks.
+
+Times the packet pipeline against synthetic packet streams so changes can be
+compared without a treadmill:
+
+    producer -> PacketReader.responses() -> parse_response -> CSV writer
+
+Each stage is timed separately (by timing the pipeline cut off after each
+stage and subtracting the previous stage) and reported in frames/sec along
+with peak traced memory.
+
+Usage:
+    ./benchmark.py --frames=10000 --frames=1000000 --loss=0.01 \
+        --output=results.json --baseline=previous.json
+
+With --baseline, stages that got slower by more than --tolerance are flagged
+and the exit status is non-zero.
+
+With --startup, the time taken to start a fresh interpreter and import each of
+the entry points (see `python -X importtime`) is measured instead, along with
+the slowest imports of each, so heavy dependencies creeping into the startup
+path are caught:
+
+    ./benchmark.py --startup --output=startup.json --baseline=previous.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import packet_reader
+import platform
+import random
+import ifit_requests
+import responses
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import writers
+
+# Device info and type code of a treadmill state response.
+_STATE_PREFIX = bytes.fromhex("0104022e042e02")
+
+# Payload of a treadmill state response, used as a template for synthetic
+# frames.
+_STATE_PAYLOAD = bytes.fromhex(
+    "02c1002c0171006a17000000000000025502250b00009112a203b4005d"
+    "0128015802ec022000ec022000"
+)
+
+
+def synthetic_packets(
+    num_frames: int, num_templates: int = 256, loss: float = 0.0, seed: int = 0
+):
+    """Yields the packets of `num_frames` treadmill state responses.
+
+    Responses are framed with `ifit_requests.to_request_packets` (with a trailing
+    checksum byte, as the treadmill sends) and padded to full 20-byte packets.
+    Each header carries the sequence number from the previous end packet, so
+    the stream is valid for a strict `PacketReader`.
+
+    To keep generation cheap, `num_templates` distinct frames are built up
+    front (with varying pace/incline/distance/timer) and then cycled.
+
+    If `loss` is set, each packet is independently dropped with that
+    probability (using a generator seeded with `seed`), mimicking lost BLE
+    notifications.
+    """
+    sequences = []
+    previous_end = bytes(20)
+    for index in range(num_templates):
+        payload = bytearray(_STATE_PAYLOAD)
+        payload[1:3] = (800 + index).to_bytes(2, "little")
+        payload[3:5] = (index * 10).to_bytes(2, "little")
+        payload[7:9] = (index * 3).to_bytes(2, "little")
+        payload[18:20] = index.to_bytes(2, "little")
+
+        packets = ifit_requests.to_request_packets(
+            bytearray(_STATE_PREFIX) + payload + b"\x00"
+        )
+        packets[0].extend(previous_end[4:])
+        previous_end = bytes(packets[-1])
+        sequences.append([bytes(packet) for packet in packets])
+
+    # The first header of each cycle must match the last end packet.
+    sequences[0][0] = sequences[0][0][:4] + previous_end[4:]
+
+    packets = itertools.chain.from_iterable(
+        itertools.islice(itertools.cycle(sequences), num_frames)
+    )
+    if loss:
+        rng = random.Random(seed)
+        packets = (packet for packet in packets if rng.random() >= loss)
+
+    yield from packets
+
+
+class _SyntheticProducer:
+    """Producer yielding synthetic packets (see `synthetic_packets`)."""
+
+    def __init__(self, num_frames: int, loss: float = 0.0):
+        self._num_frames = num_frames
+        self._loss = loss
+
+    def packets(self):
+        return synthetic_packets(self._num_frames, loss=self._loss)
+
+
+def _produce(producer, _) -> int:
+    """Stage 1: drain the producer."""
+    return sum(1 for _ in producer.packets())
+
+
+def _read(producer, _) -> int:
+    """Stage 2: assemble responses."""
+    reader = packet_reader.PacketReader(producer, resync=True)
+    return sum(1 for _ in reader.responses())
+
+
+def _parse(producer, _) -> int:
+    """Stage 3: parse responses."""
+    reader = packet_reader.PacketReader(producer, resync=True)
+    num_frames = 0
+    for response_data in reader.responses():
+        if responses.parse_response(response_data):
+            num_frames += 1
+    return num_frames
+
+
+def _write(producer, output_path) -> int:
+    """Stage 4: write treadmill states as `nongofit.main` does."""
+    reader = packet_reader.PacketReader(producer, resync=True)
+    num_frames = 0
+    with writers.BackgroundWriter(writers.CsvWriter(output_path)) as writer:
+        for response_data in reader.responses():
+            if not (response := responses.parse_response(response_data)):
+                continue
+            if response.type == responses.ResponseTypes.TREADMILL_STATE:
+                writer.write(response.to_row())
+                num_frames += 1
+    return num_frames
+
+
+# Pipelines, each extending the previous one by a single stage.
+_STAGES = (
+    ("produce", _produce),
+    ("read", _read),
+    ("parse", _parse),
+    ("write", _write),
+)
+
+
+def _run(pipeline, num_frames: int, loss: float, trace: bool):
+    """Runs `pipeline` once, returning (seconds, peak traced bytes)."""
+    producer = _SyntheticProducer(num_frames, loss)
+    with tempfile.TemporaryDirectory() as output_directory:
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        pipeline(producer, os.path.join(output_directory, "output"))
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_pipeline(
+    num_frames: int, loss: float = 0.0, repeat: int = 3, memory: bool = True
+) -> dict:
+    """Times each pipeline stage over `num_frames` synthetic frames.
+
+    Returns:
+      A dict keyed by stage name with the stage's own time (best of `repeat`,
+      excluding earlier stages), its throughput and the peak traced memory of
+      the pipeline up to and including it.
+    """
+    results = {}
+    previous = 0.0
+    for name, pipeline in _STAGES:
+        elapsed = min(
+            _run(pipeline, num_frames, loss, trace=False)[0] for _ in range(repeat)
+        )
+
+        # Tracing slows allocations down, so memory is measured separately.
+        peak = _run(pipeline, num_frames, loss, trace=True)[1] if memory else None
+
+        stage_seconds = max(elapsed - previous, 1e-9)
+        results[name] = {
+            "seconds": stage_seconds,
+            "cumulative_seconds": elapsed,
+            "frames_per_second": num_frames / stage_seconds,
+            "peak_traced_bytes": peak,
+        }
+        previous = elapsed
+
+    return results
+
+
+# Modules timed by `bench_startup`: the runner, and what file replays and tests
+# load.
+_STARTUP_MODULES = ("nongofit", "producers", "packet_reader", "responses")
+
+
+def _parse_importtime(output: str) -> list:
+    """Parses `-X importtime` output into (depth, module, cumulative us)."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((depth, name.strip(), int(cumulative)))
+    return imports
+
+
+def bench_startup(module: str, repeat: int = 3, slowest: int = 5) -> dict:
+    """Times starting a fresh interpreter and importing `module`.
+
+    Returns:
+      The best wall-clock time of the interpreter, the best cumulative import
+      time of `module` (as reported by `-X importtime`) and its `slowest`
+      direct imports from that run.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=directory,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        wall_seconds = time.perf_counter() - start
+
+        imports = _parse_importtime(result.stderr)
+        # Imports are reported after everything they import, so the module's
+        # own imports are the ones after the previous top-level import.
+        index = next(
+            index
+            for index, (depth, name, _) in enumerate(imports)
+            if depth == 0 and name == module
+        )
+        start_index = index
+        while start_index > 0 and imports[start_index - 1][0] > 0:
+            start_index -= 1
+        children = sorted(
+            (
+                (name, cumulative)
+                for depth, name, cumulative in imports[start_index:index]
+                if depth == 1
+            ),
+            key=lambda child: -child[1],
+        )
+
+        run = {
+            "wall_seconds": wall_seconds,
+            "import_seconds": imports[index][2] / 1e6,
+            "slowest_imports": {
+                name: cumulative / 1e6 for name, cumulative in children[:slowest]
+            },
+        }
+        if best is None or run["import_seconds"] < best["import_seconds"]:
+            best = run
+        best["wall_seconds"] = min(best["wall_seconds"], wall_seconds)
+    return best
+
+
+def _environment() -> dict:
+    return {
+        "python": sys.version,
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+    }
+
+
+def _compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns descriptions of stages slower than `baseline` by `tolerance`."""
+    regressions = []
+    for module, startup in results.get("startup", {}).items():
+        try:
+            previous = baseline["startup"][module]["import_seconds"]
+        except KeyError:
+            continue
+        ratio = startup["import_seconds"] / previous
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"import {module}: {ratio:.0%} of baseline "
+                f"({startup['import_seconds'] * 1e3:.1f} vs "
+                f"{previous * 1e3:.1f} ms)"
+            )
+
+    for num_frames, stages in results["runs"].items():
+        for name, stage in stages.items():
+            try:
+                previous = baseline["runs"][num_frames][name]["frames_per_second"]
+            except KeyError:
+                continue
+            ratio = stage["frames_per_second"] / previous
+            if ratio < 1 - tolerance:
+                regressions.append(
+                    f"{name} @ {num_frames} frames: {ratio:.0%} of baseline "
+                    f"({stage['frames_per_second']:,.0f} vs {previous:,.0f} "
+                    f"frames/s)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the packet pipeline")
+    parser.add_argument(
+        "--frames",
+        type=int,
+        action="append",
+        help="Number of synthetic frames to process; may be repeated "
+        "(default: 10000 and 100000)",
+    )
+    parser.add_argument(
+        "--loss",
+        type=float,
+        default=0.0,
+        help="Probability of dropping each packet",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed runs; the fastest is reported",
+    )
+    parser.add_argument(
+        "--memory",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Whether to measure peak memory (an extra, slower run per stage)",
+    )
+    parser.add_argument(
+        "--startup",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Whether to measure interpreter startup and import times instead "
+        "of the pipeline",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to which to write the results as JSON",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="Results JSON from a previous run to compare against",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Fractional slowdown versus --baseline reported as a regression",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "environment": _environment(),
+        "loss": args.loss,
+        "runs": {},
+    }
+    if args.startup:
+        results["startup"] = {}
+        for module in _STARTUP_MODULES:
+            startup = bench_startup(module, args.repeat)
+            results["startup"][module] = startup
+            slowest = ", ".join(
+                f"{name} {seconds * 1e3:.1f}ms"
+                for name, seconds in startup["slowest_imports"].items()
+            )
+            print(
+                f"import {module:<14} {startup['import_seconds'] * 1e3:7.1f}ms "
+                f"(interpreter {startup['wall_seconds'] * 1e3:.0f}ms; "
+                f"slowest: {slowest})"
+            )
+
+    for num_frames in () if args.startup else args.frames or (10_000, 100_000):
+        stages = bench_pipeline(num_frames, args.loss, args.repeat, args.memory)
+        results["runs"][str(num_frames)] = stages
+
+        print(f"{num_frames:,} frames (loss={args.loss}):")
+        for name, stage in stages.items():
+            memory = ""
+            if stage["peak_traced_bytes"] is not None:
+                memory = f", peak {stage['peak_traced_bytes']:,} bytes traced"
+            print(
+                f"  {name:<8} {stage['frames_per_second']:>14,.0f} frames/s "
+                f"({stage['seconds']:.3f}s){memory}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = _compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
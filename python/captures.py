@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+"""NongoFit - binary packet captures.
+
+A compact alternative to the hex text files read by `FilePacketProducer`. A
+capture is a small header followed by fixed-size packet records:
+
+    4e474643 01 01 1400 | <timestamp> <20 packet bytes> | ...
+    MMMMMMMM VV FF SSSS
+
+    (M)agic: b'NGFC'
+    (V)ersion
+    (F)lags: bit 0 set if each record is prefixed with a timestamp
+    (S)ize of the packet portion of each record (little-endian)
+
+Timestamps are little-endian doubles (seconds); their epoch is up to whoever
+wrote the capture. Packets shorter than the record size are zero-padded.
+
+Hex captures can be converted with:
+
+    ./captures.py packets.txt packets.ngfc
+"""
+
+import argparse
+import mmap
+import struct
+
+MAGIC = b"NGFC"
+VERSION = 1
+
+# Size of a single BLE notification from the treadmill.
+PACKET_SIZE = 20
+
+# Header flags.
+FLAG_TIMESTAMPS = 0x1
+
+_HEADER = struct.Struct("<4sBBH")
+_TIMESTAMP = struct.Struct("<d")
+
+
+def is_binary_capture(filename: str) -> bool:
+    """Returns whether `filename` looks like a binary capture."""
+    with open(filename, "rb") as capture_file:
+        return capture_file.read(len(MAGIC)) == MAGIC
+
+
+class CaptureWriter:
+    """Writes packets to a binary capture.
+
+    Args:
+      capture_file: file object opened in binary mode.
+      timestamps: whether to store a timestamp with each packet.
+    """
+
+    def __init__(self, capture_file, timestamps: bool = False):
+        self._file = capture_file
+        self._timestamps = timestamps
+        self._file.write(
+            _HEADER.pack(
+                MAGIC, VERSION, FLAG_TIMESTAMPS if timestamps else 0, PACKET_SIZE
+            )
+        )
+
+    def write(self, packet: bytearray, timestamp: float = 0.0):
+        """Appends `packet` (and `timestamp`, if enabled) to the capture."""
+        if len(packet) > PACKET_SIZE:
+            raise ValueError(
+                f"Packet of {len(packet)} bytes exceeds the {PACKET_SIZE}-byte "
+                f"record size: {bytes(packet).hex()}"
+            )
+
+        if self._timestamps:
+            self._file.write(_TIMESTAMP.pack(timestamp))
+        self._file.write(packet)
+        if len(packet) < PACKET_SIZE:
+            self._file.write(bytes(PACKET_SIZE - len(packet)))
+
+
+class CaptureReader:
+    """Replays a binary capture through `mmap` without copying packets.
+
+    Packets are yielded as read-only `memoryview`s into the mapped file; they
+    are only valid while the reader is open, so copy any that need to outlive
+    it.
+
+    Args:
+      filename: path to the capture.
+    """
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._file = None
+        self._mmap = None
+        self._view = None
+
+        # Populated from the header on open.
+        self.timestamps = False
+        self._packet_size = PACKET_SIZE
+
+    def __enter__(self):
+        self._file = open(self._filename, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        try:
+            if len(self._view) < _HEADER.size:
+                raise ValueError(f"{self._filename} is too short to be a capture")
+            magic, version, flags, packet_size = _HEADER.unpack_from(self._view)
+            if magic != MAGIC:
+                raise ValueError(f"{self._filename} is not a binary capture")
+            if version != VERSION:
+                raise ValueError(f"Unsupported capture version: {version}")
+        except ValueError:
+            self.__exit__(None, None, None)
+            raise
+
+        self.timestamps = bool(flags & FLAG_TIMESTAMPS)
+        self._packet_size = packet_size
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A consumer is still holding a packet; the mapping is released
+            # once the last view goes away.
+            pass
+        self._file.close()
+
+    def _records(self):
+        """Yields (offset, packet offset) pairs for each complete record."""
+        record_size = self._packet_size
+        if self.timestamps:
+            record_size += _TIMESTAMP.size
+
+        end = len(self._view) - record_size
+        for offset in range(_HEADER.size, end + 1, record_size):
+            yield offset, offset + record_size - self._packet_size
+
+    def packets(self) -> memoryview:
+        """Yields each packet in the capture."""
+        view = self._view
+        packet_size = self._packet_size
+        for _, start in self._records():
+            yield view[start : start + packet_size]
+
+    def records(self) -> tuple:
+        """Returns the raw records, for bulk (e.g. NumPy) processing.
+
+        Returns:
+          A (buffer, record size, packet offset) tuple: `buffer` holds every
+          complete record back to back, and each record's packet starts
+          `packet offset` bytes into it and is `packet_size` bytes long.
+        """
+        record_size = self._packet_size
+        if self.timestamps:
+            record_size += _TIMESTAMP.size
+        num_records = (len(self._view) - _HEADER.size) // record_size
+        buffer = self._view[_HEADER.size : _HEADER.size + num_records * record_size]
+        return buffer, record_size, record_size - self._packet_size
+
+    @property
+    def packet_size(self) -> int:
+        return self._packet_size
+
+    def timestamped_packets(self):
+        """Yields (timestamp, packet) pairs; timestamps are 0.0 if not stored."""
+        view = self._view
+        packet_size = self._packet_size
+        for offset, start in self._records():
+            timestamp = 0.0
+            if self.timestamps:
+                (timestamp,) = _TIMESTAMP.unpack_from(view, offset)
+            yield timestamp, view[start : start + packet_size]
+
+
+def convert_hex_capture(input_filename: str, output_filename: str) -> int:
+    """Converts a hex capture (one packet per line) into a binary capture.
+
+    Returns:
+      The number of packets converted.
+    """
+    num_packets = 0
+    with open(input_filename, "r") as input_file, open(
+        output_filename, "wb"
+    ) as output_file:
+        writer = CaptureWriter(output_file)
+        for line in input_file:
+            if not (line := line.strip()):
+                continue
+            writer.write(bytearray.fromhex(line))
+            num_packets += 1
+
+    return num_packets
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a hex packet capture into a binary capture"
+    )
+    parser.add_argument("input_file", help="Hex capture, one packet per line")
+    parser.add_argument("output_file", help="Path of the binary capture to write")
+    args = parser.parse_args()
+
+    num_packets = convert_hex_capture(args.input_file, args.output_file)
+    print(f"Converted {num_packets} packets to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import captures
+import os
+import packet_reader
+import tempfile
+import unittest
+
+# A single treadmill state sequence.
+_PACKETS = [
+    "fe0232040205040502020d0000302a0000000000",
+    "00120104022e042e0202c1002c0171006a170000",
+    "011200000000025502250b00009112a203b4005d",
+    "ff0e0128015802ec022000ec0220009803b4005d",
+]
+
+
+class CapturesTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def _path(self, name):
+        return os.path.join(self._directory.name, name)
+
+    def test_convert_hex_capture(self):
+        with open(self._path("packets.txt"), "w") as hex_file:
+            hex_file.write("\n".join(_PACKETS) + "\n")
+
+        num_packets = captures.convert_hex_capture(
+            self._path("packets.txt"), self._path("packets.ngfc")
+        )
+
+        self.assertEqual(num_packets, len(_PACKETS))
+        self.assertTrue(captures.is_binary_capture(self._path("packets.ngfc")))
+        self.assertFalse(captures.is_binary_capture(self._path("packets.txt")))
+        with captures.CaptureReader(self._path("packets.ngfc")) as reader:
+            self.assertFalse(reader.timestamps)
+            self.assertEqual(
+                [bytes(packet).hex() for packet in reader.packets()], _PACKETS
+            )
+
+    def test_timestamps(self):
+        with open(self._path("packets.ngfc"), "wb") as capture_file:
+            writer = captures.CaptureWriter(capture_file, timestamps=True)
+            for index, packet in enumerate(_PACKETS):
+                writer.write(bytes.fromhex(packet), timestamp=index * 0.5)
+
+        with captures.CaptureReader(self._path("packets.ngfc")) as reader:
+            self.assertTrue(reader.timestamps)
+            self.assertEqual(
+                [
+                    (timestamp, bytes(packet).hex())
+                    for timestamp, packet in reader.timestamped_packets()
+                ],
+                [(index * 0.5, packet) for index, packet in enumerate(_PACKETS)],
+            )
+
+    def test_short_packets_are_padded(self):
+        with open(self._path("packets.ngfc"), "wb") as capture_file:
+            captures.CaptureWriter(capture_file).write(bytes.fromhex("fe020102"))
+
+        with captures.CaptureReader(self._path("packets.ngfc")) as reader:
+            (packet,) = reader.packets()
+            self.assertEqual(bytes(packet), bytes.fromhex("fe020102") + bytes(16))
+
+    def test_long_packets_are_rejected(self):
+        with open(self._path("packets.ngfc"), "wb") as capture_file:
+            writer = captures.CaptureWriter(capture_file)
+            with self.assertRaises(ValueError):
+                writer.write(bytes(captures.PACKET_SIZE + 1))
+
+    def test_not_a_capture(self):
+        with open(self._path("packets.txt"), "w") as hex_file:
+            hex_file.write("\n".join(_PACKETS))
+
+        with self.assertRaises(ValueError):
+            with captures.CaptureReader(self._path("packets.txt")):
+                pass
+
+    def test_packet_reader(self):
+        with open(self._path("packets.ngfc"), "wb") as capture_file:
+            writer = captures.CaptureWriter(capture_file)
+            # The second header carries the sequence number from the first
+            # end packet.
+            header = "fe023204" + _PACKETS[-1][8:]
+            for packet in _PACKETS + [header] + _PACKETS[1:]:
+                writer.write(bytes.fromhex(packet))
+
+        with captures.CaptureReader(self._path("packets.ngfc")) as capture:
+            reader = packet_reader.PacketReader(capture)
+            frames = [bytes(frame).hex() for frame in reader.responses()]
+
+        self.assertEqual(
+            frames,
+            [
+                "0104022e042e0202c1002c0171006a17000000000000025502250b00009112a2"
+                "03b4005d0128015802ec022000ec022000"
+            ]
+            * 2,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""NongoFit - asynchronous, rate-limited debug output.
+
+Printing every frame from the packet loop ties throughput to the terminal: a
+slow SSH session or a paused pager stalls packet consumption. `DebugPrinter`
+takes the formatting and printing off the packet loop:
+
+  * `submit` only checks the rate limit and queues a copy of the frame, so
+    the packet loop pays a few hundred nanoseconds per frame at most.
+  * A background thread decodes and formats queued frames and prints them.
+  * The queue is bounded; if output can't keep up, the oldest queued lines
+    are dropped (and counted in `dropped_lines`) rather than blocking.
+
+Example usage:
+
+    with debug_output.DebugPrinter(max_rate=5, only_changes=True) as printer:
+        for response_data in reader.responses():
+            printer.submit(response_data)
+        printer.print_line("Done")
+"""
+
+import collections
+import responses
+import threading
+import time
+
+
+class DebugPrinter:
+    """Prints debug strings of frames on a background thread.
+
+    Args:
+      max_rate: most frames printed per second; 0 for no limit. Frames
+        arriving faster are skipped (and counted in `skipped_frames`).
+      only_changes: whether to skip frames identical to the previous one.
+      capacity: most lines queued for printing at once.
+      prefix: prepended to every frame's debug string (e.g. the device).
+      output: function printing one line.
+    """
+
+    def __init__(
+        self,
+        max_rate: float = 0,
+        only_changes: bool = False,
+        capacity: int = 1024,
+        prefix: str = "",
+        output=print,
+    ):
+        self._interval = 1 / max_rate if max_rate else 0
+        self._only_changes = only_changes
+        self._prefix = prefix
+        self._output = output
+
+        # Earliest time at which the next frame may be printed.
+        self._next_time = 0.0
+        self._last_frame = None
+
+        # Frames (bytes) and lines (str) to print; deque appends and pops are
+        # thread-safe, so no lock is needed.
+        self._queue = collections.deque(maxlen=capacity)
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self.skipped_frames = 0
+        self.dropped_lines = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, response_data):
+        """Queues the debug string of a frame, subject to the rate limit.
+
+        The frame is copied, so views of a reused buffer (e.g. from
+        `PacketReader.responses()`) are fine.
+        """
+        if self._only_changes and response_data == self._last_frame:
+            self.skipped_frames += 1
+            return
+        if self._interval:
+            now = time.monotonic()
+            if now < self._next_time:
+                self.skipped_frames += 1
+                return
+            self._next_time = now + self._interval
+
+        frame = bytes(response_data)
+        if self._only_changes:
+            self._last_frame = frame
+        self._append(frame)
+
+    def print_line(self, line: str):
+        """Queues `line` as is; it is not rate limited."""
+        self._append(line)
+
+    def _append(self, item):
+        queue = self._queue
+        if len(queue) == queue.maxlen:
+            self.dropped_lines += 1
+        queue.append(item)
+        self._wakeup.set()
+
+    def close(self):
+        """Prints everything still queued and stops the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+
+    def _run(self):
+        queue = self._queue
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Read before printing so items queued ahead of `close` are
+            # printed.
+            closed = self._closed
+            while queue:
+                item = queue.popleft()
+                if isinstance(item, bytes):
+                    item = self._prefix + responses.parse_response(item).debug_string()
+                self._output(item)
+            if closed:
+                return
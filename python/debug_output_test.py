@@ -0,0 +1,78 @@
+import debug_output
+import responses
+import threading
+import unittest
+from unittest import mock
+
+# Full treadmill state frame (device info, type and payload).
+_STATE_FRAME = bytes.fromhex(
+    "0104022e042e0202c1002c0171006a17000000000000025502250b00009112a203b4005d"
+    "0128015802ec022000ec022000"
+)
+
+
+class DebugPrinterTest(unittest.TestCase):
+    def test_prints_in_order(self):
+        lines = []
+        buffer = bytearray(_STATE_FRAME)
+        with debug_output.DebugPrinter(prefix="[a] ", output=lines.append) as printer:
+            printer.submit(buffer)
+            # The frame was copied, so reusing the buffer is fine.
+            buffer[:] = bytes(len(buffer))
+            printer.print_line("summary")
+
+        self.assertEqual(
+            lines,
+            [
+                "[a] " + responses.parse_response(_STATE_FRAME).debug_string(),
+                "summary",
+            ],
+        )
+
+    def test_only_changes(self):
+        lines = []
+        other_frame = _STATE_FRAME[:-1] + b"\x01"
+        with debug_output.DebugPrinter(
+            only_changes=True, output=lines.append
+        ) as printer:
+            for frame in (_STATE_FRAME, _STATE_FRAME, other_frame, other_frame):
+                printer.submit(frame)
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(printer.skipped_frames, 2)
+
+    @mock.patch.object(debug_output.time, "monotonic")
+    def test_max_rate(self, monotonic):
+        lines = []
+        with debug_output.DebugPrinter(max_rate=2, output=lines.append) as printer:
+            for now in (0.0, 0.1, 0.4, 0.5, 0.6, 1.0):
+                monotonic.return_value = now
+                printer.submit(_STATE_FRAME)
+
+        # One frame per half second.
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(printer.skipped_frames, 3)
+
+    def test_drops_oldest_when_full(self):
+        lines = []
+        printing = threading.Event()
+        release = threading.Event()
+
+        def slow_output(line):
+            printing.set()
+            release.wait()
+            lines.append(line)
+
+        with debug_output.DebugPrinter(capacity=2, output=slow_output) as printer:
+            printer.print_line("first")
+            printing.wait()
+            for line in ("a", "b", "c"):
+                printer.print_line(line)
+            release.set()
+
+        self.assertEqual(lines, ["first", "b", "c"])
+        self.assertEqual(printer.dropped_lines, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
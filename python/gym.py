@@ -0,0 +1,197 @@
+"""NongoFit - gym mode.
+
+Drives many treadmills from a single process and a single asyncio event loop.
+Each device gets its own `BluetoothPacketProducer` and `PacketReader`, but no
+threads of its own: polling runs as a coroutine (`PollingScheduler.async_run`),
+packets are consumed with `PacketReader.async_responses()`, and the blocking
+connect/write calls share one small thread pool. Every treadmill state is
+written to one shared output writer, tagged with the device address.
+
+If a device disconnects (or stops answering), its session is torn down and
+reconnected with exponential backoff without affecting the others.
+
+Devices are given as a list of MAC addresses or as a config file with one
+address per line (blank lines and `#` comments are ignored):
+
+    # Front row
+    C0:FF:EE:00:00:01
+    C0:FF:EE:00:00:02
+
+Note: the GATTTool backend still runs one `gatttool` subprocess per
+connection; what gym mode removes is the per-device polling thread pool and
+packet loop.
+"""
+
+import asyncio
+import concurrent.futures
+import debug_output
+import packet_reader
+import producers
+import responses
+
+# Threads shared by all devices for blocking BLE calls (connecting, writing
+# requests). Deliberately independent of the number of devices.
+_BLOCKING_WORKERS = 8
+
+
+def read_config(path: str) -> list:
+    """Reads device addresses from a gym config file."""
+    addresses = []
+    with open(path) as config_file:
+        for line in config_file:
+            if line := line.split("#", 1)[0].strip():
+                addresses.append(line)
+    return addresses
+
+
+class DeviceSession:
+    """Connects to, polls and reads from a single device until cancelled.
+
+    Args:
+      address: MAC address of the device.
+      writer: shared output writer; rows are tagged with `address`.
+      executor: executor for blocking BLE calls.
+      poll_rate: target number of state requests per second.
+      stale_timeouts: number of consecutive unanswered requests after which
+        the connection is considered dead and re-established.
+      max_reconnect_delay: longest wait (in seconds) between reconnects.
+      debug: whether to print each response (see `debug_output`).
+      debug_max_rate: most responses per second printed; 0 for no limit.
+      debug_only_changes: whether to only print responses that changed.
+      **producer_options: passed to `BluetoothPacketProducer` (e.g.
+        `buffer_capacity`).
+    """
+
+    def __init__(
+        self,
+        address: str,
+        writer,
+        executor,
+        poll_rate: float = 1.0,
+        stale_timeouts: int = 5,
+        max_reconnect_delay: float = 60.0,
+        debug: bool = False,
+        debug_max_rate: float = 0,
+        debug_only_changes: bool = False,
+        **producer_options,
+    ):
+        self.address = address
+        self._writer = writer
+        self._executor = executor
+        self._poll_rate = poll_rate
+        self._stale_timeouts = stale_timeouts
+        self._max_reconnect_delay = max_reconnect_delay
+        self._producer_options = producer_options
+
+        # Printing happens off the event loop.
+        self._printer = None
+        if debug:
+            self._printer = debug_output.DebugPrinter(
+                max_rate=debug_max_rate,
+                only_changes=debug_only_changes,
+                prefix=f"[{address}] ",
+            )
+
+        self.connects = 0
+        self.responses = 0
+
+    async def run(self):
+        """Keeps the device connected, reconnecting with backoff."""
+        delay = 1.0
+        try:
+            while True:
+                try:
+                    await self._run_once()
+                    # Clean disconnect - reconnect promptly.
+                    delay = 1.0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    print(f"[{self.address}] {type(error).__name__}: {error}")
+                    delay = min(delay * 2, self._max_reconnect_delay)
+
+                print(f"[{self.address}] Reconnecting in {delay:.0f}s")
+                await asyncio.sleep(delay)
+        finally:
+            if self._printer is not None:
+                self._printer.close()
+
+    async def _run_once(self):
+        """Runs a single connection until it drops."""
+        loop = asyncio.get_running_loop()
+        producer = producers.BluetoothPacketProducer(
+            self.address,
+            poll_rate=self._poll_rate,
+            poll_in_thread=False,
+            **self._producer_options,
+        )
+        tasks = []
+        try:
+            await loop.run_in_executor(self._executor, producer.__enter__)
+            self.connects += 1
+            print(f"[{self.address}] Connected")
+
+            tasks = [
+                asyncio.create_task(producer.scheduler.async_run(self._executor)),
+                asyncio.create_task(self._watch(producer)),
+            ]
+            reader = packet_reader.PacketReader(producer, resync=True)
+            async for response_data in reader.async_responses():
+                response = responses.parse_response(response_data)
+                if response.type != responses.ResponseTypes.TREADMILL_STATE:
+                    continue
+
+                self.responses += 1
+                if self._printer is not None:
+                    self._printer.submit(response_data)
+                if self._writer is not None:
+                    self._writer.write((self.address,) + response.to_row())
+        finally:
+            for task in tasks:
+                task.cancel()
+            await loop.run_in_executor(
+                self._executor, producer.__exit__, None, None, None
+            )
+
+    async def _watch(self, producer):
+        """Cancels `producer` once its requests stop being answered."""
+        while producer.scheduler.consecutive_timeouts < self._stale_timeouts:
+            await asyncio.sleep(1)
+        print(f"[{self.address}] No responses - dropping connection")
+        producer.cancel()
+
+
+async def run(
+    addresses: list,
+    writer=None,
+    poll_rate: float = 1.0,
+    debug: bool = False,
+    debug_max_rate: float = 0,
+    debug_only_changes: bool = False,
+    **producer_options,
+):
+    """Runs a `DeviceSession` for each of `addresses` until cancelled."""
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=_BLOCKING_WORKERS
+    ) as executor:
+        sessions = [
+            DeviceSession(
+                address,
+                writer,
+                executor,
+                poll_rate,
+                debug=debug,
+                debug_max_rate=debug_max_rate,
+                debug_only_changes=debug_only_changes,
+                **producer_options,
+            )
+            for address in addresses
+        ]
+        try:
+            await asyncio.gather(*(session.run() for session in sessions))
+        finally:
+            for session in sessions:
+                print(
+                    f"[{session.address}] {session.responses} responses over "
+                    f"{session.connects} connections"
+                )
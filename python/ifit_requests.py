@@ -1,4 +1,4 @@
-"""NongoFit - request helpers.
+"""NongoFit - iFit request helpers.
 
 Utilities for building structured requests out of raw data. Once a
 PacketReader has assembled a full sequence, the tools here can build a
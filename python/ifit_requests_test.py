@@ -1,16 +1,16 @@
-import requests
+import ifit_requests
 import unittest
 
 
-class RequestsTest(unittest.TestCase):
+class IfitRequestsTest(unittest.TestCase):
     def test_empty_data(self):
         with self.assertRaises(ValueError):
-            requests.to_request_packets(bytearray([]))
+            ifit_requests.to_request_packets(bytearray([]))
 
     def test_two_packet_request(self):
         # Final packet has a single 0x1.
         data = bytearray([0x1])
-        req_bytes = requests.to_request_packets(data)
+        req_bytes = ifit_requests.to_request_packets(data)
 
         # Convert to hex for easier verification.
         hexxed = [raw.hex() for raw in req_bytes]
@@ -25,7 +25,7 @@ class RequestsTest(unittest.TestCase):
         data.extend([0x1] * 0x12)
         data.append(0x2)
 
-        req_bytes = requests.to_request_packets(data)
+        req_bytes = ifit_requests.to_request_packets(data)
 
         # Convert to hex for easier verification.
         hexxed = [raw.hex() for raw in req_bytes]
@@ -47,7 +47,7 @@ class RequestsTest(unittest.TestCase):
         data.extend([0x2] * 0x12)
         data.extend([0x3] * 0x12)
 
-        req_bytes = requests.to_request_packets(data)
+        req_bytes = ifit_requests.to_request_packets(data)
 
         # Convert to hex for easier verification.
         hexxed = [raw.hex() for raw in req_bytes]
@@ -63,7 +63,8 @@ class RequestsTest(unittest.TestCase):
         )
 
     def test_treadmill_state_request(self):
-        hexxed = [raw.hex() for raw in requests.TreadmillStateRequest().to_packets()]
+        packets = ifit_requests.TreadmillStateRequest().to_packets()
+        hexxed = [raw.hex() for raw in packets]
 
         self.assertEqual(
             hexxed,
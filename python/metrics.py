@@ -0,0 +1,222 @@
+"""NongoFit - pipeline metrics.
+
+A small metrics registry with counters, gauges and histograms, exposed in the
+Prometheus text format over a local HTTP endpoint and as a one-line summary
+for periodic logging.
+
+Nothing here runs on the hot path unless metrics are enabled: the pipeline
+keeps plain integer counters (e.g. `PacketReader.dropped_frames`) and metrics
+read them through `function` only when collected. Per-frame timings are
+recorded by the caller, and only if a registry exists.
+
+Example usage:
+
+    registry = metrics.Registry()
+    registry.register(
+        metrics.Counter("frames_total", "Frames", function=lambda: reader.frames)
+    )
+    server = metrics.serve(registry, port=9100)
+    with metrics.StatsPrinter(registry, interval=10):
+        ...
+    server.shutdown()
+"""
+
+import bisect
+import threading
+
+
+class Counter:
+    """A monotonically increasing value, optionally split by one label.
+
+    Args:
+      name: metric name.
+      help: description of the metric.
+      label: name of the label distinguishing values, if any.
+      function: callable returning the current value, read on collection.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, label: str = None, function=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._function = function
+        self._values = {}
+
+    def inc(self, amount: float = 1, label_value: str = None):
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def samples(self):
+        """Yields (suffix, labels, value) for each value."""
+        if self._function is not None:
+            yield "", {}, self._function()
+            return
+        for label_value, value in list(self._values.items()):
+            labels = {self.label: label_value} if self.label else {}
+            yield "", labels, value
+
+    def summary(self) -> str:
+        return f"{sum(value for _, _, value in self.samples()):g}"
+
+
+class Gauge(Counter):
+    """A value that can go up and down (e.g. a queue depth)."""
+
+    type = "gauge"
+
+    def set(self, value: float, label_value: str = None):
+        self._values[label_value] = value
+
+
+class Histogram:
+    """Counts observations (e.g. durations in seconds) into buckets.
+
+    Args:
+      name: metric name.
+      help: description of the metric.
+      buckets: upper bounds of the buckets, in increasing order.
+    """
+
+    type = "histogram"
+
+    # Suited to durations between a microsecond and a few seconds.
+    DEFAULT_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 1e-2, 0.1, 1, 5)
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self._buckets = tuple(buckets)
+        # The last count is for values above every bucket.
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self._buckets, self._counts):
+            cumulative += count
+            yield "_bucket", {"le": f"{bound:g}"}, cumulative
+        yield "_bucket", {"le": "+Inf"}, self._count
+        yield "_sum", {}, self._sum
+        yield "_count", {}, self._count
+
+    def summary(self) -> str:
+        if not self._count:
+            return "-"
+        return f"{self._sum / self._count * 1e6:.1f}us avg"
+
+
+class Registry:
+    """A collection of metrics."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Adds `metric` to the registry and returns it."""
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                if labels:
+                    label_string = ",".join(
+                        f'{label}="{label_value}"'
+                        for label, label_value in labels.items()
+                    )
+                    lines.append(f"{metric.name}{suffix}{{{label_string}}} {value}")
+                else:
+                    lines.append(f"{metric.name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    def stats_line(self) -> str:
+        """Summarizes every metric on a single line, suitable for logging."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return " ".join(
+            f"{metric.name.removeprefix('nongofit_')}={metric.summary()}"
+            for metric in metrics
+        )
+
+
+class _MetricsHandler:
+    """Request handler serving `registry` (mixed into a `BaseHTTPRequestHandler`)."""
+
+    registry = None
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of the debug output.
+        pass
+
+
+def serve(registry: Registry, port: int, host: str = "127.0.0.1"):
+    """Serves `registry` at http://<host>:<port>/metrics on a daemon thread.
+
+    Returns:
+      The server; call `shutdown()` to stop it.
+    """
+    # http.server is slow to import, so only import it when serving.
+    import http.server
+
+    handler = type(
+        "MetricsHandler",
+        (_MetricsHandler, http.server.BaseHTTPRequestHandler),
+        {"registry": registry},
+    )
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StatsPrinter:
+    """Prints `registry.stats_line()` every `interval` seconds until closed."""
+
+    def __init__(self, registry: Registry, interval: float, output=print):
+        self._registry = registry
+        self._interval = interval
+        self._output = output
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self._output(self._registry.stats_line())
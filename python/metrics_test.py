@@ -0,0 +1,78 @@
+import metrics
+import time
+import unittest
+import urllib.request
+
+
+class MetricsTest(unittest.TestCase):
+    def test_counter(self):
+        registry = metrics.Registry()
+        counter = registry.register(
+            metrics.Counter("nongofit_frames_total", "Frames", "type")
+        )
+        counter.inc(label_value="TREADMILL_STATE")
+        counter.inc(2, label_value="UNKNOWN")
+
+        self.assertEqual(
+            registry.render(),
+            "# HELP nongofit_frames_total Frames\n"
+            "# TYPE nongofit_frames_total counter\n"
+            'nongofit_frames_total{type="TREADMILL_STATE"} 1\n'
+            'nongofit_frames_total{type="UNKNOWN"} 2\n',
+        )
+        self.assertEqual(registry.stats_line(), "frames_total=3")
+
+    def test_function_gauge(self):
+        queue = [1, 2, 3]
+        registry = metrics.Registry()
+        registry.register(metrics.Gauge("depth", "Depth", function=queue.__len__))
+
+        self.assertIn("depth 3\n", registry.render())
+        queue.pop()
+        self.assertIn("depth 2\n", registry.render())
+
+    def test_histogram(self):
+        histogram = metrics.Histogram("latency", "Latency", buckets=(1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+
+        self.assertEqual(
+            list(histogram.samples()),
+            [
+                ("_bucket", {"le": "1"}, 2),
+                ("_bucket", {"le": "10"}, 3),
+                ("_bucket", {"le": "+Inf"}, 4),
+                ("_sum", {}, 56.5),
+                ("_count", {}, 4),
+            ],
+        )
+
+    def test_duplicate_name(self):
+        registry = metrics.Registry()
+        registry.register(metrics.Counter("frames", "Frames"))
+        with self.assertRaises(ValueError):
+            registry.register(metrics.Gauge("frames", "Frames"))
+
+    def test_serve(self):
+        registry = metrics.Registry()
+        registry.register(metrics.Counter("frames", "Frames", function=lambda: 7))
+        server = metrics.serve(registry, port=0)
+        self.addCleanup(server.shutdown)
+
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertIn("frames 7\n", response.read().decode())
+
+    def test_stats_printer(self):
+        registry = metrics.Registry()
+        registry.register(metrics.Counter("frames", "Frames", function=lambda: 7))
+        lines = []
+        with metrics.StatsPrinter(registry, 0.01, output=lines.append):
+            while not lines:
+                time.sleep(0.001)
+
+        self.assertEqual(lines[0], "frames=7")
+
+
+if __name__ == "__main__":
+    unittest.main()
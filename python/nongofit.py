@@ -9,16 +9,26 @@ Usage:
 
 That will connect to the treadmill at <MAC> and start writing state to
 --output_directory.
+
+To run many treadmills from one process (see `gym`), pass a comma-separated
+list with --treadmill_addresses or a config file with --gym_config; output rows
+are then tagged with the device address.
 """
 
+import aggregator
 import argparse
 import contextlib
-import csv
-import datetime
-import os
+import debug_output
+import metrics
+import packet_buffer
 import packet_reader
 import producers
 import responses
+import time
+import writers
+
+# Workout seconds between summary lines in --debug mode.
+_SUMMARY_INTERVAL = 30
 
 
 def main():
@@ -37,12 +47,47 @@ def main():
         required=False,
         help="MAC address of the treadmill to which to connect",
     )
+    input_group.add_argument(
+        "--treadmill_addresses",
+        type=str,
+        required=False,
+        help="Comma-separated MAC addresses of treadmills to which to connect "
+        "from a single process",
+    )
+    input_group.add_argument(
+        "--gym_config",
+        type=str,
+        required=False,
+        help="Path to a file listing treadmill MAC addresses, one per line",
+    )
     input_group.add_argument(
         "--input_file",
         type=str,
         required=False,
-        help="Path to a file containing raw packet data; mostly useful "
-        "for debugging",
+        help="Path to a file containing raw packet data, either hex text or "
+        "a binary capture (detected automatically); mostly useful for debugging",
+    )
+
+    parser.add_argument(
+        "--poll_rate",
+        type=float,
+        default=1.0,
+        help="Target number of state requests per second sent to the treadmill; "
+        "backs off automatically if responses lag",
+    )
+
+    parser.add_argument(
+        "--buffer_capacity",
+        type=int,
+        default=4096,
+        help="Maximum number of received packets queued for processing; "
+        "0 for no limit",
+    )
+    parser.add_argument(
+        "--overflow_policy",
+        choices=packet_buffer.POLICIES,
+        default=packet_buffer.DROP_OLDEST_FRAME,
+        help="What to do with packets received while the queue is full",
     )
 
     # Output options.
@@ -52,48 +97,277 @@ def main():
         required=False,
         help=(
             "Directory to which to write output data; the file will be "
-            "named YYYYmmdd_HHMMSS.csv; if unset, write nothing"
+            "named YYYYmmdd_HHMMSS.<format>; if unset, write nothing"
         ),
     )
+    parser.add_argument(
+        "--output_format",
+        choices=sorted(writers.WRITERS),
+        default="csv",
+        help="Format of the output data",
+    )
+    parser.add_argument(
+        "--output_batch_size",
+        type=int,
+        default=1024,
+        help="Number of rows buffered before they are written",
+    )
+    parser.add_argument(
+        "--output_flush_interval",
+        type=float,
+        default=1.0,
+        help="Maximum number of seconds between writes",
+    )
+
+    # Monitoring options.
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        required=False,
+        help="Port on which to serve pipeline metrics (Prometheus text format) "
+        "at http://localhost:<port>/metrics; if unset, metrics are not served",
+    )
+    parser.add_argument(
+        "--stats_interval",
+        type=float,
+        default=0,
+        help="Seconds between pipeline stats lines printed to stdout; 0 disables",
+    )
+
     parser.add_argument(
         "--debug",
         action=argparse.BooleanOptionalAction,
         help=("Whether to write debug output to stdout"),
     )
+    parser.add_argument(
+        "--debug_max_rate",
+        type=float,
+        default=0,
+        help="Most frames per second printed in --debug mode; 0 for no limit",
+    )
+    parser.add_argument(
+        "--debug_only_changes",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Whether to only print frames that differ from the previous one in "
+        "--debug mode",
+    )
     args = parser.parse_args()
 
+    if args.treadmill_addresses or args.gym_config:
+        run_gym(args)
+        return
+
     if args.treadmill_address:
-        producer = producers.BluetoothPacketProducer(args.treadmill_address)
+        producer = producers.create_producer(
+            "bluetooth",
+            args.treadmill_address,
+            poll_rate=args.poll_rate,
+            buffer_capacity=args.buffer_capacity,
+            overflow_policy=args.overflow_policy,
+        )
     else:
-        producer = producers.FilePacketProducer(args.input_file)
+        producer = producers.create_producer("file", args.input_file)
 
     if args.output_directory:
-        output_path = os.path.join(
-            args.output_directory, f"{datetime.datetime.now():%Y%m%d_%H%M%S}.csv"
+        output_writer = writers.open_writer(
+            args.output_format,
+            args.output_directory,
+            batch_size=args.output_batch_size,
+            flush_interval=args.output_flush_interval,
         )
-        output_file = open(output_path, "w")
-        csv_writer = csv.DictWriter(
-            output_file, fieldnames=("incline", "pace", "distance", "timer")
-        )
-        csv_writer.writeheader()
     else:
-        output_file = contextlib.nullcontext()
-        csv_writer = None
+        output_writer = contextlib.nullcontext()
+
+    # Live workout statistics, printed periodically in --debug mode.
+    workout = aggregator.Aggregator() if args.debug else None
+    next_summary = 0
+
+    # Metrics cost nothing per frame unless requested.
+    registry = None
+    if args.metrics_port or args.stats_interval:
+        registry = metrics.Registry()
 
     with contextlib.ExitStack() as stack:
+        output_writer = stack.enter_context(output_writer)
         producer = stack.enter_context(producer)
-        output = stack.enter_context(output_file)
 
-        reader = packet_reader.PacketReader(producer)
+        # Recover from dropped/reordered notifications rather than losing the
+        # whole session.
+        reader = packet_reader.PacketReader(producer, resync=True)
+
+        # Formatting and printing happen off the packet loop.
+        if args.debug:
+            printer = stack.enter_context(
+                debug_output.DebugPrinter(
+                    max_rate=args.debug_max_rate,
+                    only_changes=args.debug_only_changes,
+                )
+            )
+
+        if registry is not None:
+            frame_types, parse_seconds = register_metrics(
+                registry, producer, reader, output_writer
+            )
+            if args.metrics_port:
+                server = metrics.serve(registry, args.metrics_port)
+                stack.callback(server.shutdown)
+            if args.stats_interval:
+                stack.enter_context(
+                    metrics.StatsPrinter(registry, args.stats_interval)
+                )
+
         for response_data in reader.responses():
-            if not (response := responses.parse_response(response_data)):
-                continue
+            if registry is None:
+                response = responses.parse_response(response_data)
+            else:
+                start = time.perf_counter()
+                response = responses.parse_response(response_data)
+                parse_seconds.observe(time.perf_counter() - start)
+                frame_types.inc(label_value=response.type.name)
 
             if response.type == responses.ResponseTypes.TREADMILL_STATE:
                 if args.debug:
-                    print(response.debug_string())
-                if csv_writer is not None:
-                    csv_writer.writerow(response.to_dict())
+                    printer.submit(response_data)
+                    workout.update(response)
+                    if workout.elapsed >= next_summary:
+                        printer.print_line(workout.summary_line())
+                        next_summary = workout.elapsed + _SUMMARY_INTERVAL
+                if output_writer is not None:
+                    output_writer.write(response.to_row())
+
+    if args.debug:
+        print(workout.summary_line())
+        print(
+            f"Debug output: skipped {printer.skipped_frames} frames, "
+            f"dropped {printer.dropped_lines} lines"
+        )
+        print(
+            f"Dropped frames: {reader.dropped_frames}, "
+            f"out-of-order packets: {reader.out_of_order_packets}, "
+            f"sequence mismatches: {reader.sequence_mismatches}"
+        )
+        if args.treadmill_address:
+            print(f"Polling: {producer.scheduler.stats()}")
+            print(
+                f"Buffer: high-water mark {producer.buffer.high_water_mark} "
+                f"packets, dropped {producer.buffer.dropped_frames} frames "
+                f"({producer.buffer.dropped_packets} packets)"
+            )
+
+
+def register_metrics(registry, producer, reader, output_writer):
+    """Registers the pipeline's metrics.
+
+    Returns:
+      The frames-by-type counter and parse time histogram, which the caller
+      updates for each frame.
+    """
+    if hasattr(producer, "queued_packets"):
+        registry.register(
+            metrics.Counter(
+                "nongofit_packets_received_total",
+                "Notifications received from the device",
+                function=lambda: producer.packets_received,
+            )
+        )
+        registry.register(
+            metrics.Gauge(
+                "nongofit_queued_packets",
+                "Packets received but not yet consumed",
+                function=producer.queued_packets,
+            )
+        )
+        for metric, name, help in (
+            (metrics.Gauge, "high_water_mark", "Most packets queued at once"),
+            (metrics.Counter, "dropped_packets", "Packets dropped when full"),
+            (metrics.Counter, "dropped_frames", "Frames dropped when full"),
+        ):
+            registry.register(
+                metric(
+                    f"nongofit_buffer_{name}",
+                    help,
+                    function=lambda name=name: getattr(producer.buffer, name),
+                )
+            )
+
+    for name, help in (
+        ("frames", "Frames assembled"),
+        ("dropped_frames", "Partial frames discarded"),
+        ("out_of_order_packets", "Packets received with an unexpected index"),
+        ("sequence_mismatches", "Headers following a missing sequence"),
+        ("discarded_packets", "Packets received outside of a sequence"),
+    ):
+        registry.register(
+            metrics.Counter(
+                f"nongofit_{name}_total",
+                help,
+                function=lambda name=name: getattr(reader, name),
+            )
+        )
+
+    frame_types = registry.register(
+        metrics.Counter("nongofit_frames_by_type_total", "Frames by type", "type")
+    )
+    parse_seconds = registry.register(
+        metrics.Histogram("nongofit_parse_seconds", "Time taken to parse a frame")
+    )
+
+    if output_writer is not None:
+        registry.register(output_writer.flush_seconds)
+        registry.register(
+            metrics.Gauge(
+                "nongofit_pending_rows",
+                "Rows queued but not yet written",
+                function=output_writer.pending_rows,
+            )
+        )
+
+    return frame_types, parse_seconds
+
+
+def run_gym(args):
+    """Runs gym mode for the devices listed in `args`."""
+    # Gym mode is the only user of asyncio, which is slow to import.
+    import asyncio
+    import gym
+
+    if args.gym_config:
+        addresses = gym.read_config(args.gym_config)
+    else:
+        addresses = [
+            address.strip()
+            for address in args.treadmill_addresses.split(",")
+            if address.strip()
+        ]
+
+    if args.output_directory:
+        output_writer = writers.open_writer(
+            args.output_format,
+            args.output_directory,
+            fields=writers.TAGGED_FIELDS,
+            batch_size=args.output_batch_size,
+            flush_interval=args.output_flush_interval,
+        )
+    else:
+        output_writer = contextlib.nullcontext()
+
+    with output_writer as writer:
+        try:
+            asyncio.run(
+                gym.run(
+                    addresses,
+                    writer,
+                    args.poll_rate,
+                    args.debug,
+                    debug_max_rate=args.debug_max_rate,
+                    debug_only_changes=args.debug_only_changes,
+                    buffer_capacity=args.buffer_capacity,
+                    overflow_policy=args.overflow_policy,
+                )
+            )
+        except KeyboardInterrupt:
+            print("Received stop command - workouts complete!")
 
 
 if __name__ == "__main__":
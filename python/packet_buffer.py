@@ -0,0 +1,157 @@
+"""NongoFit - bounded packet buffer.
+
+`PacketBuffer` is the FIFO queue between a producer's notification thread and
+the packet consumer. With a `capacity`, it never holds more than that many
+packets; once full, new packets are handled according to the overflow policy:
+
+  * DROP_OLDEST_FRAME: discard the oldest whole frame (everything up to the
+    next `PacketReader.HEADER_MARKER`) to make room, favouring fresh data.
+  * DROP_NEWEST: discard the incoming frame, favouring complete history.
+  * BLOCK: make the notification thread wait for the consumer (up to
+    `block_timeout` seconds, after which the packet is dropped as with
+    DROP_NEWEST).
+
+Whole frames are dropped rather than single packets, so the buffer never
+hands out half a frame because of an overflow. `high_water_mark`,
+`dropped_packets` and `dropped_frames` record how close to (or over) capacity
+the buffer has been.
+"""
+
+import collections
+import packet_reader
+import threading
+
+DROP_OLDEST_FRAME = "drop_oldest_frame"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+
+POLICIES = (DROP_OLDEST_FRAME, DROP_NEWEST, BLOCK)
+
+
+class PacketBuffer:
+    """Thread-safe FIFO queue of packets with an optional capacity.
+
+    Args:
+      capacity: maximum number of queued packets; 0 for unbounded.
+      policy: what to do with packets arriving while full (see `POLICIES`).
+      block_timeout: longest time (in seconds) the `BLOCK` policy waits for
+        room before dropping the packet.
+    """
+
+    _HEADER_FIRST, _HEADER_SECOND = packet_reader.PacketReader.HEADER_MARKER
+
+    def __init__(
+        self,
+        capacity: int = 0,
+        policy: str = DROP_OLDEST_FRAME,
+        block_timeout: float = 1.0,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy}; expected {POLICIES}")
+        if capacity < 0:
+            raise ValueError(f"Capacity must not be negative, got {capacity}")
+
+        self.capacity = capacity
+        self.policy = policy
+        self._block_timeout = block_timeout
+
+        self._packets = collections.deque()
+        self._lock = threading.Lock()
+        # Signalled whenever a packet is removed (or the buffer is closed).
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+        # Set while the rest of a frame is being dropped (DROP_NEWEST).
+        self._dropping_frame = False
+
+        self.high_water_mark = 0
+        self.dropped_packets = 0
+        self.dropped_frames = 0
+
+    def __len__(self) -> int:
+        return len(self._packets)
+
+    def _is_header(self, packet) -> bool:
+        return (
+            len(packet) > 1
+            and packet[0] == self._HEADER_FIRST
+            and packet[1] == self._HEADER_SECOND
+        )
+
+    def append(self, packet) -> bool:
+        """Queues `packet`, applying the overflow policy if full.
+
+        Returns:
+          Whether the packet was queued.
+        """
+        packets = self._packets
+        with self._lock:
+            if self._dropping_frame:
+                if not self._is_header(packet):
+                    self.dropped_packets += 1
+                    return False
+                self._dropping_frame = False
+
+            if self.capacity and len(packets) >= self.capacity:
+                if self.policy == DROP_OLDEST_FRAME:
+                    self._drop_oldest_frame()
+                elif self.policy == BLOCK and not self._closed:
+                    self._not_full.wait_for(
+                        lambda: len(packets) < self.capacity or self._closed,
+                        self._block_timeout,
+                    )
+
+                if len(packets) >= self.capacity:
+                    self._drop_newest_frame(packet)
+                    return False
+
+            packets.append(packet)
+            if len(packets) > self.high_water_mark:
+                self.high_water_mark = len(packets)
+            return True
+
+    def _drop_oldest_frame(self):
+        """Drops packets from the front up to the next header."""
+        packets = self._packets
+        packets.popleft()
+        self.dropped_packets += 1
+        while packets and not self._is_header(packets[0]):
+            packets.popleft()
+            self.dropped_packets += 1
+        self.dropped_frames += 1
+
+    def _drop_newest_frame(self, packet):
+        """Drops `packet` along with the rest of its frame.
+
+        Packets of the same frame that are already queued are removed too,
+        and the frame's remaining packets are dropped as they arrive.
+        """
+        packets = self._packets
+        self.dropped_packets += 1
+        if not self._is_header(packet):
+            while packets and not self._is_header(packets[-1]):
+                packets.pop()
+                self.dropped_packets += 1
+            if packets:
+                packets.pop()
+                self.dropped_packets += 1
+        self.dropped_frames += 1
+        self._dropping_frame = True
+
+    def popleft(self):
+        """Removes and returns the oldest packet.
+
+        Raises:
+          IndexError: if the buffer is empty.
+        """
+        with self._lock:
+            packet = self._packets.popleft()
+            if self.policy == BLOCK:
+                self._not_full.notify()
+            return packet
+
+    def close(self):
+        """Releases any producer blocked waiting for room."""
+        with self._lock:
+            self._closed = True
+            self._not_full.notify_all()
@@ -0,0 +1,106 @@
+import packet_buffer
+import threading
+import unittest
+
+
+def _frame(index):
+    """Packets of a minimal frame, tagged with `index`."""
+    return [bytes([0xFE, 0x02, index]), bytes([0x00, index]), bytes([0xFF, index])]
+
+
+def _drain(buffer):
+    packets = []
+    while buffer:
+        packets.append(buffer.popleft())
+    return packets
+
+
+class PacketBufferTest(unittest.TestCase):
+    def test_unbounded(self):
+        buffer = packet_buffer.PacketBuffer()
+        for index in range(100):
+            for packet in _frame(index):
+                self.assertTrue(buffer.append(packet))
+
+        self.assertEqual(len(buffer), 300)
+        self.assertEqual(buffer.high_water_mark, 300)
+        self.assertEqual(buffer.dropped_packets, 0)
+
+    def test_drop_oldest_frame(self):
+        buffer = packet_buffer.PacketBuffer(capacity=7)
+        for index in range(3):
+            for packet in _frame(index):
+                buffer.append(packet)
+
+        # Frame 0 made room for frame 2, and the buffer starts on a header.
+        self.assertEqual(_drain(buffer), _frame(1) + _frame(2))
+        self.assertEqual(buffer.dropped_frames, 1)
+        self.assertEqual(buffer.dropped_packets, 3)
+        self.assertEqual(buffer.high_water_mark, 7)
+
+    def test_drop_oldest_frame_partially_consumed(self):
+        buffer = packet_buffer.PacketBuffer(capacity=6)
+        for index in range(2):
+            for packet in _frame(index):
+                buffer.append(packet)
+        buffer.popleft()
+
+        for packet in _frame(2):
+            buffer.append(packet)
+
+        # The rest of frame 0 was dropped rather than frame 1.
+        self.assertEqual(_drain(buffer), _frame(1) + _frame(2))
+
+    def test_drop_newest(self):
+        buffer = packet_buffer.PacketBuffer(
+            capacity=4, policy=packet_buffer.DROP_NEWEST
+        )
+        for index in range(2):
+            for packet in _frame(index):
+                buffer.append(packet)
+
+        # Frame 1 did not fit, so none of it is kept.
+        self.assertEqual(_drain(buffer), _frame(0))
+        self.assertEqual(buffer.dropped_frames, 1)
+        self.assertEqual(buffer.dropped_packets, 3)
+
+        for packet in _frame(2):
+            buffer.append(packet)
+        self.assertEqual(_drain(buffer), _frame(2))
+
+    def test_block(self):
+        buffer = packet_buffer.PacketBuffer(capacity=3, policy=packet_buffer.BLOCK)
+        for packet in _frame(0):
+            buffer.append(packet)
+
+        appended = []
+        thread = threading.Thread(
+            target=lambda: appended.append(buffer.append(_frame(1)[0]))
+        )
+        thread.start()
+        thread.join(0.05)
+        self.assertTrue(thread.is_alive())
+
+        buffer.popleft()
+        thread.join(5)
+        self.assertEqual(appended, [True])
+        self.assertEqual(buffer.dropped_packets, 0)
+
+    def test_block_times_out(self):
+        buffer = packet_buffer.PacketBuffer(
+            capacity=3, policy=packet_buffer.BLOCK, block_timeout=0.01
+        )
+        for index in range(2):
+            for packet in _frame(index):
+                buffer.append(packet)
+
+        self.assertEqual(_drain(buffer), _frame(0))
+        self.assertEqual(buffer.dropped_frames, 1)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            packet_buffer.PacketBuffer(policy="drop_everything")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,10 +11,26 @@ Example usage:
             if (response := responses.parse_response(response_data)):
                 print(response.debug_string())
 
+Responses are read-only views into a buffer that is reused for the next
+sequence, so they are only valid until the next response is requested. Pass
+`copy=True` to get independent `bytes` for responses that need to be kept.
+
+By default a malformed sequence (e.g. a dropped or reordered notification)
+raises a `PacketError`. Pass `resync=True` to instead discard the partial
+sequence, count the loss and pick up again at the next header packet:
+
+    reader = packet_reader.PacketReader(packet_producer, resync=True)
+    ...
+    print(f'Dropped {reader.dropped_frames} frames')
+
 See additional documentation below.
 """
 
 
+class PacketError(ValueError):
+    """Raised when packets do not form a valid sequence."""
+
+
 class PacketReader:
     """Reads packets from a producer and combines them into meaningful data.
 
@@ -39,39 +55,108 @@ class PacketReader:
     HEADER_MARKER = b"\xfe\x02"
     END_MARKER = b"\xff"
 
-    def __init__(self, producer):
+    # Packets may be any bytes-like object (e.g. memoryviews from a binary
+    # capture), so markers are compared byte-by-byte rather than with
+    # `startswith` (which is also cheaper than slicing).
+    _HEADER_FIRST, _HEADER_SECOND = HEADER_MARKER
+    (_END_BYTE,) = END_MARKER
+
+    # The header declares the data size in a single byte, so no sequence can
+    # assemble more than this.
+    _MAX_DATA_SIZE = 0xFF
+
+    # Every packet carries at least two bytes of metadata; headers carry four.
+    _MIN_PACKET_SIZE = 2
+    _MIN_HEADER_SIZE = 4
+
+    def __init__(self, producer, copy: bool = False, resync: bool = False):
         """Builds a PacketReader.
 
         Args:
             `producer`: yields packets for processig.
+            `copy`: whether to yield independent copies of each response rather
+                than views into the reusable buffer.
+            `resync`: whether to recover from malformed sequences (by dropping
+                them and waiting for the next header) rather than raising.
         """
         self._producer = producer
+        self._copy = copy
+        self._resync = resync
+
+        # Sequences successfully assembled.
+        self.frames = 0
+
+        # Loss counters.
+        #
+        # Sequences discarded because a packet was missing or malformed.
+        self.dropped_frames = 0
+        # Intermediate packets that arrived with an unexpected index.
+        self.out_of_order_packets = 0
+        # Headers whose sequence number did not match the previous end packet
+        # (i.e. at least one whole sequence went missing in between).
+        self.sequence_mismatches = 0
+        # Packets ignored while waiting for the next header.
+        self.discarded_packets = 0
+
+        # Sequences are assembled into a single preallocated buffer (which is
+        # never resized, so views of it stay valid) and responses are
+        # read-only slices of `_response_view`.
+        self._data = bytearray(self._MAX_DATA_SIZE)
+        self._response_view = memoryview(self._data).toreadonly()
         self._reset()
 
         # The sequence_num carries over between sequences so it is not reset.
-        self._sequence_num = None
+        self._sequence_num = bytearray()
+        self._has_sequence_num = False
 
     def _reset(self):
         """Resets the state and prepares for the next sequence."""
+        self._in_sequence = False
         self._packets_remaining = 0
         self._last_packet_index = -1
-
-        self._current_data = bytearray()
+        self._data_size = 0
+        self._data_end = 0
 
     def responses(self):
         """Generator that returns fully assembled responses."""
         for packet in self._producer.packets():
-            if packet.startswith(self.HEADER_MARKER):
-                self._handle_header_packet(packet)
-            elif packet.startswith(self.END_MARKER):
-                # Last packet -> prepare for response!
-                self._handle_end_packet(packet)
-                yield self._current_data
-
-                # Prep for the next sequence.
-                self._reset()
-            else:
-                self._handle_intermediate_packet(packet)
+            if (response := self._handle_packet(packet)) is not None:
+                yield response
+
+    async def async_responses(self):
+        """Asynchronous variant of `responses()`.
+
+        Requires a producer with an `async_packets()` asynchronous generator.
+        """
+        async for packet in self._producer.async_packets():
+            if (response := self._handle_packet(packet)) is not None:
+                yield response
+
+    def _handle_packet(self, packet: bytearray):
+        """Handles a single packet, returning the response once assembled."""
+        if len(packet) < self._MIN_PACKET_SIZE:
+            self._discard_packet(packet)
+            return None
+
+        first = packet[0]
+        if first == self._HEADER_FIRST and packet[1] == self._HEADER_SECOND:
+            self._handle_header_packet(packet)
+        elif first == self._END_BYTE:
+            # Last packet -> prepare for response!
+            if not self._handle_end_packet(packet):
+                return None
+            self.frames += 1
+            response = self._response_view[: self._data_end]
+            if self._copy:
+                response = bytes(response)
+
+            # Prep for the next sequence.
+            self._reset()
+            return response
+        else:
+            self._handle_intermediate_packet(packet)
+
+        return None
 
     def _handle_header_packet(self, packet: bytearray):
         """Parses the first packet in a sequence.
@@ -83,18 +168,33 @@ class PacketReader:
           fe02 32 04 02060406900208a46e0e005702b4002b
           HHHH CC PP DDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDD
         """
+        if self._in_sequence:
+            self._drop_frame(
+                f"Header received with {self._packets_remaining} packets "
+                f"outstanding"
+            )
+
+        if len(packet) < self._MIN_HEADER_SIZE:
+            self._discard_packet(packet)
+            return
+
+        data_size = packet[2]
         num_packets = packet[3]
         sequence_num = packet[4:]
 
-        self._packets_remaining = num_packets - 1
-
         # Note: no data is extracted from the this packet - it is pure metadata.
 
-        if self._sequence_num is not None:
-            assert self._sequence_num == sequence_num, (
-                f"Sequence number mismatch: expected "
-                f"{self._sequence_num.hex()}, got {sequence_num.hex()}"
-            )
+        if self._has_sequence_num and self._sequence_num != sequence_num:
+            self.sequence_mismatches += 1
+            if not self._resync:
+                raise PacketError(
+                    f"Sequence number mismatch: expected "
+                    f"{self._sequence_num.hex()}, got {bytes(sequence_num).hex()}"
+                )
+
+        self._in_sequence = True
+        self._packets_remaining = num_packets - 1
+        self._data_size = data_size
 
     def _handle_intermediate_packet(self, packet: bytearray):
         """Parses an intermediate (between the first and last) packet.
@@ -106,21 +206,44 @@ class PacketReader:
           00 12 0104022e042e0202a0002c0171005b0c0000
           NN SS DDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDDD
         """
+        if not self._in_sequence:
+            self._discard_packet(packet)
+            return
+
         # Extract the (N)umber and (S)ize.
         packet_index = packet[0]
         data_size = packet[1]
-        packet = packet[2:]
 
         # Are we expecting you?
-        assert packet_index == self._last_packet_index + 1
+        if packet_index != self._last_packet_index + 1:
+            self.out_of_order_packets += 1
+            self._drop_frame(
+                f"Unexpected packet index: expected "
+                f"{self._last_packet_index + 1}, got {packet_index}"
+            )
+            return
         self._last_packet_index = packet_index
 
-        self._current_data.extend(packet)
+        start = self._data_end
+        end = start + len(packet) - 2
+        if end > self._data_size:
+            self._drop_frame(
+                f"Sequence data exceeds its declared size of {self._data_size}"
+            )
+            return
+
+        # Slicing a small bytearray packet and assigning the slice is cheaper in
+        # CPython than wrapping it in a memoryview; packets that are already
+        # memoryviews (e.g. from a binary capture) are sliced without copying.
+        self._data[start:end] = packet[2:]
+        self._data_end = end
         self._packets_remaining -= 1
 
-    def _handle_end_packet(self, packet: bytearray):
+    def _handle_end_packet(self, packet: bytearray) -> bool:
         """Parses the last packet in a sequence.
 
+        Returns whether the sequence was successfully completed.
+
         The final packet contains the (H)eader, (S)ize and (D)ata.
 
         Note that the final 16 bytes of (D)ata double as the (S)equence number
@@ -131,13 +254,55 @@ class PacketReader:
           HH CC DDDDDDDDDDDDDDDDDDDDDDDDDDDD
                     SSSSSSSSSSSSSSSSSSSSSSSSSSSSSSSS
         """
-        data_size = packet[1]
-        data = packet[2 : data_size + 1]
-        sequence_num = packet[4:]
-        self._sequence_num = sequence_num
-        self._current_data.extend(data)
+        # The sequence number is valid for the next sequence even if this one
+        # is being discarded.
+        self._sequence_num[:] = packet[4:]
+        self._has_sequence_num = True
+
+        if not self._in_sequence:
+            self._discard_packet(packet)
+            return False
 
         # Ensure no tomfoolerly happened.
-        assert (
-            self._packets_remaining == 1
-        ), f"Unexpected number of packets: {self._packets_remaining}"
+        if self._packets_remaining != 1:
+            self._drop_frame(
+                f"Unexpected number of packets: {self._packets_remaining}"
+            )
+            return False
+
+        data_size = packet[1]
+        start = self._data_end
+        end = start + data_size - 1
+        if end > self._data_size or data_size + 1 > len(packet):
+            self._drop_frame(
+                f"Sequence data exceeds its declared size of {self._data_size}"
+            )
+            return False
+
+        self._data[start:end] = packet[2 : data_size + 1]
+        self._data_end = end
+        return True
+
+    def _drop_frame(self, message: str):
+        """Discards the partially assembled sequence.
+
+        Raises:
+          PacketError: unless resyncing is enabled.
+        """
+        self.dropped_frames += 1
+        if not self._resync:
+            raise PacketError(message)
+        self._reset()
+
+    def _discard_packet(self, packet: bytearray):
+        """Ignores a packet received outside of a sequence.
+
+        Raises:
+          PacketError: unless resyncing is enabled.
+        """
+        self.discarded_packets += 1
+        if not self._resync:
+            raise PacketError(
+                f"Packet received outside of a sequence: {bytes(packet).hex()}"
+            )
+
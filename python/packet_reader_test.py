@@ -0,0 +1,144 @@
+import packet_reader
+import unittest
+
+# Two consecutive treadmill state sequences; the second header carries the
+# sequence number from the first end packet.
+_PACKETS = [
+    "fe0232040205040502020d0000302a0000000000",
+    "00120104022e042e0202c1002c0171006a170000",
+    "011200000000025502250b00009112a203b4005d",
+    "ff0e0128015802ec022000ec0220009803b4005d",
+    "fe023204015802ec022000ec0220009803b4005d",
+    "00120104022e042e0202a0002c0171005b0c0000",
+    "011200000001023203421700007a641f02b4002b",
+    "ff0e01790058028a760e008a760e003a02b4002b",
+]
+
+_RESPONSES = [
+    "0104022e042e0202c1002c0171006a17000000000000025502250b00009112a203b4005d"
+    "0128015802ec022000ec022000",
+    "0104022e042e0202a0002c0171005b0c000000000001023203421700007a641f02b4002b"
+    "01790058028a760e008a760e00",
+]
+
+
+class _ListProducer:
+    def __init__(self, packets):
+        self._packets = [bytearray.fromhex(packet) for packet in packets]
+
+    def packets(self):
+        return iter(self._packets)
+
+
+def _without(packets, *indices):
+    return [packet for index, packet in enumerate(packets) if index not in indices]
+
+
+class PacketReaderTest(unittest.TestCase):
+    def test_responses(self):
+        reader = packet_reader.PacketReader(_ListProducer(_PACKETS))
+        self.assertEqual(
+            [bytes(response).hex() for response in reader.responses()], _RESPONSES
+        )
+
+    def test_responses_are_read_only_views(self):
+        reader = packet_reader.PacketReader(_ListProducer(_PACKETS))
+        first, second = reader.responses()
+
+        self.assertIsInstance(first, memoryview)
+        self.assertTrue(first.readonly)
+        # The buffer is reused, so the first view now shows the second response.
+        self.assertEqual(bytes(first).hex(), _RESPONSES[1][: len(first) * 2])
+
+    def test_copy(self):
+        reader = packet_reader.PacketReader(_ListProducer(_PACKETS), copy=True)
+        responses = list(reader.responses())
+
+        self.assertEqual([response.hex() for response in responses], _RESPONSES)
+
+    def test_memoryview_packets(self):
+        producer = _ListProducer(_PACKETS)
+        producer._packets = [memoryview(packet) for packet in producer._packets]
+        reader = packet_reader.PacketReader(producer, copy=True)
+
+        self.assertEqual(
+            [response.hex() for response in reader.responses()], _RESPONSES
+        )
+
+    def assertResponses(self, packets, expected, **counters):
+        reader = packet_reader.PacketReader(
+            _ListProducer(packets), copy=True, resync=True
+        )
+        self.assertEqual(
+            [response.hex() for response in reader.responses()], expected
+        )
+        for name, value in counters.items():
+            self.assertEqual(getattr(reader, name), value, name)
+
+    def test_resync_missing_intermediate_packet(self):
+        self.assertResponses(
+            _without(_PACKETS, 1),
+            _RESPONSES[1:],
+            dropped_frames=1,
+            out_of_order_packets=1,
+            sequence_mismatches=0,
+        )
+
+    def test_resync_missing_final_intermediate_packet(self):
+        self.assertResponses(
+            _without(_PACKETS, 2),
+            _RESPONSES[1:],
+            dropped_frames=1,
+            out_of_order_packets=0,
+        )
+
+    def test_resync_reordered_packets(self):
+        packets = list(_PACKETS)
+        packets[1], packets[2] = packets[2], packets[1]
+        self.assertResponses(
+            packets,
+            _RESPONSES[1:],
+            dropped_frames=1,
+            out_of_order_packets=1,
+            discarded_packets=2,
+        )
+
+    def test_resync_missing_end_packet(self):
+        self.assertResponses(
+            _without(_PACKETS, 3),
+            _RESPONSES[1:],
+            dropped_frames=1,
+            sequence_mismatches=0,
+        )
+
+    def test_resync_missing_header_packet(self):
+        self.assertResponses(
+            _without(_PACKETS, 0),
+            _RESPONSES[1:],
+            dropped_frames=0,
+            discarded_packets=3,
+        )
+
+    def test_resync_missing_sequence(self):
+        self.assertResponses(
+            _PACKETS[:4] + _PACKETS,
+            [_RESPONSES[0]] + _RESPONSES,
+            dropped_frames=0,
+            sequence_mismatches=1,
+        )
+
+    def test_strict_errors(self):
+        for packets in [
+            _without(_PACKETS, 1),
+            _without(_PACKETS, 2),
+            _without(_PACKETS, 3),
+            _without(_PACKETS, 0),
+            _PACKETS[:4] + _PACKETS,
+        ]:
+            reader = packet_reader.PacketReader(_ListProducer(packets))
+            with self.assertRaises(packet_reader.PacketError):
+                list(reader.responses())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+"""NongoFit - state polling.
+
+The treadmill only reports its state when asked, so a producer has to keep
+sending requests. `PollingScheduler` sends them at a configurable target rate
+and measures each request's round-trip by matching it to the next completed
+response. If responses lag behind the polling interval or stop arriving, the
+interval backs off (up to `max_interval`) and then recovers towards the target
+once responses are timely again, so a struggling GATT link is not flooded.
+
+Example usage:
+
+    scheduler = polling.PollingScheduler(send_request, target_rate=4.0)
+    executor.submit(scheduler.run)
+
+    # From the notification handler, whenever a response completes:
+    scheduler.response_received()
+
+    # Later:
+    print(scheduler.stats())
+    scheduler.stop()
+
+Inside an asyncio loop, `await scheduler.async_run()` instead; requests are
+then sent from `executor` (the loop's default executor if unset) so that a
+single loop can poll many devices.
+"""
+
+import collections
+import threading
+import time
+
+
+class PollingScheduler:
+    """Sends requests at a target rate, adapting to response latency.
+
+    Args:
+      send: callable sending a single request.
+      target_rate: desired number of requests per second.
+      max_interval: longest interval (in seconds) to back off to.
+      response_timeout: seconds to wait for a response before backing off;
+        defaults to the larger of 1 second and twice the target interval.
+      backoff: factor by which the interval grows when responses lag.
+      recovery: factor by which the interval shrinks back towards the target
+        when responses are timely.
+      history: number of recent responses used for the statistics.
+    """
+
+    def __init__(
+        self,
+        send,
+        target_rate: float = 1.0,
+        max_interval: float = 5.0,
+        response_timeout: float = None,
+        backoff: float = 2.0,
+        recovery: float = 0.8,
+        history: int = 256,
+    ):
+        if target_rate <= 0:
+            raise ValueError(f"Polling rate must be positive, got {target_rate}")
+
+        self._send = send
+        self._target_interval = 1.0 / target_rate
+        self._max_interval = max(max_interval, self._target_interval)
+        self._response_timeout = response_timeout or max(
+            1.0, 2 * self._target_interval
+        )
+        self._backoff = backoff
+        self._recovery = recovery
+
+        self.interval = self._target_interval
+
+        self._response = threading.Event()
+        self._stopped = threading.Event()
+
+        # Set while `async_run` is running.
+        self._loop = None
+        self._async_response = None
+        self._async_stopped = None
+
+        # Round-trip times and arrival times of recent responses.
+        self._latencies = collections.deque(maxlen=history)
+        self._arrivals = collections.deque(maxlen=history)
+
+        self.requests_sent = 0
+        self.responses_received = 0
+        self.timeouts = 0
+        # Timeouts since the last response; useful to detect a dead link.
+        self.consecutive_timeouts = 0
+
+    def response_received(self):
+        """Records that a response has completed. Safe to call from any thread."""
+        self._response.set()
+        if (loop := self._loop) is not None:
+            loop.call_soon_threadsafe(self._async_response.set)
+
+    def stop(self):
+        """Stops `run`/`async_run` after the current request."""
+        self._stopped.set()
+        self._response.set()
+        if (loop := self._loop) is not None:
+            loop.call_soon_threadsafe(self._async_stopped.set)
+
+    def run(self):
+        """Sends requests until `stop` is called."""
+        while not self._stopped.is_set():
+            # Anything that arrived before this request is not its response.
+            self._response.clear()
+
+            sent = time.monotonic()
+            self._send()
+            self.requests_sent += 1
+
+            if self._response.wait(self._response_timeout):
+                if self._stopped.is_set():
+                    return
+                self._record_response(sent)
+            else:
+                self._record_timeout()
+
+            self._stopped.wait(max(0.0, sent + self.interval - time.monotonic()))
+
+    async def async_run(self, executor=None):
+        """Asynchronous variant of `run`.
+
+        Args:
+          executor: `concurrent.futures.Executor` in which to call `send`.
+        """
+        # Only import asyncio when it is used; it is slow to import.
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        self._async_response = asyncio.Event()
+        self._async_stopped = asyncio.Event()
+        self._loop = loop
+
+        try:
+            while not self._stopped.is_set():
+                self._async_response.clear()
+
+                sent = time.monotonic()
+                await loop.run_in_executor(executor, self._send)
+                self.requests_sent += 1
+
+                try:
+                    await asyncio.wait_for(
+                        self._async_response.wait(), self._response_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self._record_timeout()
+                else:
+                    self._record_response(sent)
+
+                try:
+                    await asyncio.wait_for(
+                        self._async_stopped.wait(),
+                        max(0.0, sent + self.interval - time.monotonic()),
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._loop = None
+
+    def _record_response(self, sent: float):
+        received = time.monotonic()
+        latency = received - sent
+        self._latencies.append(latency)
+        self._arrivals.append(received)
+        self.responses_received += 1
+        self.consecutive_timeouts = 0
+
+        if latency > self.interval:
+            # Responses are lagging - give the device more time.
+            self._back_off()
+        else:
+            self._recover()
+
+    def _record_timeout(self):
+        self.timeouts += 1
+        self.consecutive_timeouts += 1
+        self._back_off()
+
+    def _back_off(self):
+        self.interval = min(self.interval * self._backoff, self._max_interval)
+
+    def _recover(self):
+        self.interval = max(self.interval * self._recovery, self._target_interval)
+
+    def achieved_rate(self) -> float:
+        """Responses per second over the recent history."""
+        arrivals = list(self._arrivals)
+        if len(arrivals) < 2 or arrivals[-1] == arrivals[0]:
+            return 0.0
+        return (len(arrivals) - 1) / (arrivals[-1] - arrivals[0])
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)) -> dict:
+        """Round-trip latency (in seconds) at each of `percentiles`."""
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return {percentile: None for percentile in percentiles}
+        return {
+            percentile: latencies[
+                min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+            ]
+            for percentile in percentiles
+        }
+
+    def stats(self) -> dict:
+        """Summary of the scheduler's behaviour, suitable for logging."""
+        return {
+            "target_rate": 1.0 / self._target_interval,
+            "achieved_rate": self.achieved_rate(),
+            "interval": self.interval,
+            "requests_sent": self.requests_sent,
+            "responses_received": self.responses_received,
+            "timeouts": self.timeouts,
+            "latency": self.latency_percentiles(),
+        }
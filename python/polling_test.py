@@ -0,0 +1,101 @@
+import asyncio
+import polling
+import threading
+import time
+import unittest
+
+
+class _Device:
+    """Responds to each request after `latency` seconds (if responsive)."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.responsive = True
+        self.scheduler = None
+
+    def send(self):
+        if self.responsive:
+            timer = threading.Timer(self.latency, self.scheduler.response_received)
+            timer.daemon = True
+            timer.start()
+
+
+def _start(device, **kwargs):
+    scheduler = polling.PollingScheduler(device.send, **kwargs)
+    device.scheduler = scheduler
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    return scheduler, thread
+
+
+class PollingSchedulerTest(unittest.TestCase):
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            polling.PollingScheduler(lambda: None, target_rate=0)
+
+    def test_target_rate(self):
+        scheduler, thread = _start(_Device(0.001), target_rate=50)
+        time.sleep(0.5)
+        scheduler.stop()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(scheduler.timeouts, 0)
+        self.assertAlmostEqual(scheduler.interval, 0.02)
+        self.assertGreater(scheduler.achieved_rate(), 25)
+        self.assertLessEqual(scheduler.achieved_rate(), 55)
+        latency = scheduler.latency_percentiles()
+        self.assertLess(latency[50], 0.02)
+
+    def test_backs_off_when_lagging(self):
+        scheduler, thread = _start(_Device(0.05), target_rate=100, max_interval=0.2)
+        time.sleep(0.5)
+        scheduler.stop()
+        thread.join(1)
+
+        self.assertGreater(scheduler.interval, 0.05)
+        self.assertLess(scheduler.achieved_rate(), 20)
+
+    def test_backs_off_on_timeout_and_recovers(self):
+        device = _Device(0.001)
+        device.responsive = False
+        scheduler, thread = _start(
+            device, target_rate=100, max_interval=0.1, response_timeout=0.01
+        )
+        time.sleep(0.2)
+        self.assertGreater(scheduler.timeouts, 0)
+        self.assertAlmostEqual(scheduler.interval, 0.1)
+
+        device.responsive = True
+        time.sleep(0.5)
+        scheduler.stop()
+        thread.join(1)
+
+        self.assertAlmostEqual(scheduler.interval, 0.01)
+
+    def test_stats(self):
+        scheduler = polling.PollingScheduler(lambda: None, target_rate=2)
+        stats = scheduler.stats()
+
+        self.assertEqual(stats["target_rate"], 2)
+        self.assertEqual(stats["achieved_rate"], 0.0)
+        self.assertEqual(stats["latency"], {50: None, 90: None, 99: None})
+
+    def test_async_run(self):
+        async def poll():
+            device = _Device(0.001)
+            scheduler = polling.PollingScheduler(device.send, target_rate=50)
+            device.scheduler = scheduler
+            task = asyncio.create_task(scheduler.async_run())
+            await asyncio.sleep(0.5)
+            scheduler.stop()
+            await asyncio.wait_for(task, 1)
+            return scheduler
+
+        scheduler = asyncio.run(poll())
+        self.assertGreater(scheduler.responses_received, 10)
+        self.assertEqual(scheduler.consecutive_timeouts, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
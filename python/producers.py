@@ -1,14 +1,51 @@
 """NongoFit - packet producers.
 
 Producers output a stream of raw packet bytes, one packet at a time.
+
+Producers are registered by name (see `PRODUCERS`) and created with
+`create_producer`, e.g.:
+
+    producer = producers.create_producer('file', 'packets.txt')
+
+Heavy dependencies (pygatt, asyncio) are only imported once a producer that
+needs them is used, so replaying files starts quickly.
 """
-import collections
-import concurrent.futures
-import pygatt
-import requests
-import time
+import captures
+import ifit_requests
+import packet_buffer
+import packet_reader
+import polling
+import threading
+
+# Producer classes/factories, by name.
+PRODUCERS = {}
+
+
+def register_producer(name: str):
+    """Decorator registering a producer class or factory under `name`."""
+
+    def register(producer):
+        if name in PRODUCERS:
+            raise ValueError(f"Producer {name} is already registered")
+        PRODUCERS[name] = producer
+        return producer
 
+    return register
 
+
+def create_producer(name: str, *args, **kwargs):
+    """Creates the producer registered as `name` with the given arguments."""
+    try:
+        producer = PRODUCERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown producer {name}; expected one of {sorted(PRODUCERS)}"
+        ) from None
+    return producer(*args, **kwargs)
+
+
+
+@register_producer("hex")
 class FilePacketProducer:
     """Producer that yields packets from a file.
 
@@ -41,6 +78,42 @@ class FilePacketProducer:
             yield bytearray.fromhex(line.strip())
 
 
+@register_producer("binary")
+class BinaryFilePacketProducer:
+    """Producer that replays a binary capture (see `captures`).
+
+    Packets are yielded as read-only memoryviews into the memory-mapped file,
+    so no per-packet copies are made. They are only valid while the producer
+    is open.
+
+    Args:
+      filename: path to the binary capture.
+    """
+
+    def __init__(self, filename: str):
+        self._reader = captures.CaptureReader(filename)
+
+    def __enter__(self):
+        self._reader.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._reader.__exit__(exc_type, exc_val, exc_tb)
+
+    def packets(self) -> memoryview:
+        """Yields the packets from the capture as memoryviews."""
+        return self._reader.packets()
+
+
+@register_producer("file")
+def file_producer(filename: str):
+    """Returns a producer for `filename`, detecting binary vs hex captures."""
+    if captures.is_binary_capture(filename):
+        return BinaryFilePacketProducer(filename)
+    return FilePacketProducer(filename)
+
+
+@register_producer("bluetooth")
 class BluetoothPacketProducer:
     """Producer that yields packets from a BLE stream.
 
@@ -58,6 +131,21 @@ class BluetoothPacketProducer:
       with  BluetoothPacketProducer('<device MAC>') as producer:
         # Connection started / closed on exit.
         packet_reader = PacketReader(producer)
+
+    Packets are handed over as soon as they arrive: the notification callback
+    wakes the consumer directly, either a thread blocked in `packets()` or a
+    coroutine iterating `async_packets()`.
+
+    State requests are sent by a `polling.PollingScheduler` at `poll_rate`
+    requests per second (backing off if the treadmill falls behind); see
+    `scheduler.stats()` for the achieved rate and round-trip latency. By default
+    the scheduler runs on a dedicated thread; with `poll_in_thread=False` the
+    caller is responsible for running it (e.g. `scheduler.async_run()`).
+
+    At most `buffer_capacity` packets are queued for the consumer (0 for no
+    limit); beyond that, packets are dropped or the notification thread waits
+    according to `overflow_policy` (see `packet_buffer`). The queue's counters
+    are available as `buffer`.
     """
 
     # The characteristic UUID to which to subscribe to receive value updates.
@@ -67,20 +155,50 @@ class BluetoothPacketProducer:
     # The handle to which to write value request packets.
     _VALUE_REQUEST_HANDLE = 0x000E
 
-    def __init__(self, treadmill_mac: bytes):
+    # First byte of the final packet of a response.
+    (_END_BYTE,) = packet_reader.PacketReader.END_MARKER
+
+    def __init__(
+        self,
+        treadmill_mac: bytes,
+        poll_rate: float = 1.0,
+        poll_in_thread: bool = True,
+        buffer_capacity: int = 0,
+        overflow_policy: str = packet_buffer.DROP_OLDEST_FRAME,
+    ):
         self._treadmill_mac = treadmill_mac
 
         # Add packets to a FIFO queue so they are yielded in the order received.
-        self._buffer = collections.deque()
+        self._buffer = packet_buffer.PacketBuffer(buffer_capacity, overflow_policy)
+        self.packets_received = 0
+
+        # Signalled whenever a packet is added or the producer is closed.
+        self._ready = threading.Condition()
 
-        # BLE adapter.
+        # Set while a coroutine is iterating `async_packets()`.
+        self._loop = None
+        self._wakeup = None
+
+        # BLE adapter. pygatt is slow to import, so only load it when needed.
+        import pygatt
+
+        self._pygatt = pygatt
         self._adapter = pygatt.GATTToolBackend()
 
         # The main worker thread is started asynchronously so the loop doesn't
         # block the caller.
-        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._executor = None
+        if poll_in_thread:
+            import concurrent.futures
+
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
         self._cancelled = False
 
+        self._request_packets = ifit_requests.TreadmillStateRequest().to_packets()
+        self.scheduler = polling.PollingScheduler(
+            self._send_request, target_rate=poll_rate
+        )
+
         # Device is set upon initialization.
         self._device = None
 
@@ -91,9 +209,12 @@ class BluetoothPacketProducer:
             self._treadmill_mac,
             # Note that this uses random addressing so that the connection can
             # be made to the device regardless of its Bluetooth address.
-            address_type=pygatt.BLEAddressType.random,
+            address_type=self._pygatt.BLEAddressType.random,
         )
 
+        # Stop producing if the connection drops so the consumer can notice.
+        self._device.register_disconnect_callback(self._handle_disconnect)
+
         # Subscribe to value-change notifications.
         self._device.subscribe(
             self._VALUE_UPDATE_UUID,
@@ -102,15 +223,14 @@ class BluetoothPacketProducer:
         )
 
         # Start the loop asynchronouslY.
-        self._executor.submit(self._request_update)
+        if self._executor is not None:
+            self._executor.submit(self.scheduler.run)
         return self
 
-    def _request_update(self):
-        req_packets = requests.TreadmillStateRequest().to_packets()
-        while not self._cancelled:
-            for packet in req_packets:
-                self._device.char_write_handle(self._VALUE_REQUEST_HANDLE, packet)
-            time.sleep(1)
+    def _send_request(self):
+        """Writes a single state request."""
+        for packet in self._request_packets:
+            self._device.char_write_handle(self._VALUE_REQUEST_HANDLE, packet)
 
     def _handle_value_change(self, handle, value):
         """Handles a notification containing the treadmill's current state.
@@ -129,15 +249,46 @@ class BluetoothPacketProducer:
         This handler buffers all packets and processes them once the final one
         has been received.
         """
-        self._buffer.appendleft(value)
+        # Appended outside of `_ready`, as the buffer may block (see
+        # `overflow_policy`) while the consumer drains it without the lock.
+        self.packets_received += 1
+        self._buffer.append(value)
+        with self._ready:
+            self._ready.notify()
+
+        if value and value[0] == self._END_BYTE:
+            self.scheduler.response_received()
+
+        if (loop := self._loop) is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _handle_disconnect(self, event):
+        """Handles the device disconnecting."""
+        self.cancel()
+
+    def cancel(self):
+        """Stops producing; consumers return once the queue is drained."""
+        self.scheduler.stop()
+        self._cancelled = True
+        self._buffer.close()
+        self._wake_consumers()
+
+    def _wake_consumers(self):
+        """Wakes any waiting consumer so it can notice cancellation."""
+        with self._ready:
+            self._ready.notify_all()
+
+        if (loop := self._loop) is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Clean up state on exit."""
-        # Ensure the adapter is stopped.
+        # Stop polling, then ensure the adapter is stopped.
+        self.cancel()
         self._adapter.stop()
-        self._cancelled = True
 
-        self._executor.shutdown()
+        if self._executor is not None:
+            self._executor.shutdown()
 
         # For now this program is stopped by Ctrl+C'ing it, so consider that a
         # normal exit.
@@ -145,11 +296,53 @@ class BluetoothPacketProducer:
             print("Received stop command - workout complete!")
             return True
 
+    @property
+    def buffer(self) -> packet_buffer.PacketBuffer:
+        """The queue of received packets."""
+        return self._buffer
+
+    def queued_packets(self) -> int:
+        """Number of packets received but not yet consumed."""
+        return len(self._buffer)
+
     def packets(self):
+        """Yields packets as they are received, blocking while none are queued.
+
+        Returns once the producer has been closed and the queue is drained.
+        """
+        buffer = self._buffer
         while True:
-            if not self._buffer:
-                time.sleep(0.01)
-                continue
+            with self._ready:
+                while not buffer and not self._cancelled:
+                    self._ready.wait()
+
+                if not buffer:
+                    return
+
+            # The buffer is thread-safe, so drain without the lock.
+            while buffer:
+                yield buffer.popleft()
+
+    async def async_packets(self):
+        """Asynchronous variant of `packets()` for use inside an asyncio loop.
+
+        Only one consumer (sync or async) should read from a producer.
+        """
+        import asyncio
+
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+        buffer = self._buffer
+        try:
+            while True:
+                while buffer:
+                    yield buffer.popleft()
+
+                if self._cancelled:
+                    return
 
-            while self._buffer:
-                yield self._buffer.pop()
+                await self._wakeup.wait()
+                self._wakeup.clear()
+        finally:
+            self._loop = None
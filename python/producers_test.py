@@ -0,0 +1,48 @@
+import os
+import producers
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+class ProducersTest(unittest.TestCase):
+    def test_create_producer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "packets.txt")
+            with open(path, "w") as hex_file:
+                hex_file.write("fe020102\nff0e01\n")
+
+            with producers.create_producer("file", path) as producer:
+                self.assertIsInstance(producer, producers.FilePacketProducer)
+                self.assertEqual(
+                    [bytes(packet).hex() for packet in producer.packets()],
+                    ["fe020102", "ff0e01"],
+                )
+
+    def test_unknown_producer(self):
+        with self.assertRaises(ValueError):
+            producers.create_producer("carrier_pigeon")
+
+    def test_register_producer(self):
+        with self.assertRaises(ValueError):
+            producers.register_producer("file")(producers.file_producer)
+
+    def test_bluetooth_dependencies_are_lazy(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, nongofit; "
+                "print(sorted({'pygatt', 'asyncio'} & set(sys.modules)))",
+            ],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+#!/usr/bin/python3
+"""NongoFit - offline reprocessing of capture archives.
+
+Re-decodes many raw captures (hex or binary, see `captures`) in parallel, one
+file per worker process, writing one output file per capture plus a merged
+`summary.json` for the whole run.
+
+Usage:
+    ./reprocess.py /captures/ '/more/captures/*.txt' --output_directory=/out
+
+Each capture's output is written to a temporary file and renamed into place,
+followed by a `<name>.summary.json` marking it complete. Rerunning the same
+command therefore skips captures that were already processed, so an
+interrupted run resumes where it stopped (pass --force to redo everything).
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import packet_reader
+import producers
+import responses
+import writers
+
+# Number of rows handed to the format writer at a time.
+_BATCH_SIZE = 4096
+
+_SUMMARY_SUFFIX = ".summary.json"
+
+
+def find_inputs(patterns: list) -> list:
+    """Expands directories (non-recursively) and globs into capture paths."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in os.listdir(pattern):
+                path = os.path.join(pattern, name)
+                if os.path.isfile(path):
+                    paths.add(path)
+        else:
+            paths.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def output_paths(input_path: str, output_directory: str, output_format: str):
+    """Returns the (output, summary) paths for `input_path`."""
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    extension = writers.WRITERS[output_format].extension
+    return (
+        os.path.join(output_directory, f"{name}{extension}"),
+        os.path.join(output_directory, f"{name}{_SUMMARY_SUFFIX}"),
+    )
+
+
+def process_file(input_path: str, output_directory: str, output_format: str) -> dict:
+    """Decodes a single capture; runs in a worker process.
+
+    Returns:
+      A summary of the capture, also written next to its output.
+    """
+    output_path, summary_path = output_paths(
+        input_path, output_directory, output_format
+    )
+    temporary_path = f"{output_path}.tmp"
+
+    summary = {
+        "input": input_path,
+        "output": output_path,
+        "frames": 0,
+        "treadmill_states": 0,
+        "unknown_frames": 0,
+        "dropped_frames": 0,
+        "distance": 0.0,
+        "timer": 0,
+    }
+
+    writer = writers.WRITERS[output_format](temporary_path)
+    try:
+        with producers.file_producer(input_path) as producer:
+            reader = packet_reader.PacketReader(producer, resync=True)
+            rows = []
+            for response_data in reader.responses():
+                response = responses.parse_response(response_data)
+                if response.type != responses.ResponseTypes.TREADMILL_STATE:
+                    summary["unknown_frames"] += 1
+                    continue
+
+                rows.append(response.to_row())
+                if len(rows) == _BATCH_SIZE:
+                    writer.write_rows(rows)
+                    rows = []
+
+                summary["treadmill_states"] += 1
+                summary["distance"] = max(summary["distance"], response.distance)
+                summary["timer"] = max(summary["timer"], response.timer)
+
+            if rows:
+                writer.write_rows(rows)
+
+        summary["frames"] = reader.frames
+        summary["dropped_frames"] = reader.dropped_frames
+    finally:
+        writer.close()
+
+    os.replace(temporary_path, output_path)
+    _write_json(summary_path, summary)
+    return summary
+
+
+def _write_json(path: str, data):
+    """Writes `data` to `path` atomically."""
+    with open(f"{path}.tmp", "w") as json_file:
+        json.dump(data, json_file, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _load_summary(summary_path: str):
+    """Returns the summary of an already processed capture, if any."""
+    try:
+        with open(summary_path) as summary_file:
+            return json.load(summary_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def reprocess(
+    input_paths: list,
+    output_directory: str,
+    output_format: str = "csv",
+    workers: int = None,
+    force: bool = False,
+) -> dict:
+    """Decodes `input_paths` in parallel, skipping already processed files.
+
+    Args:
+      input_paths: captures to decode.
+      output_directory: directory to which to write the outputs.
+      output_format: name of the output format (a key of `writers.WRITERS`).
+      workers: number of worker processes; defaults to the number of CPUs.
+      force: whether to redo captures that were already processed.
+
+    Returns:
+      The merged summary, also written to `summary.json`.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+
+    summaries = []
+    pending = []
+    for input_path in input_paths:
+        _, summary_path = output_paths(input_path, output_directory, output_format)
+        if not force and (summary := _load_summary(summary_path)) is not None:
+            summaries.append(summary)
+        else:
+            pending.append(input_path)
+
+    skipped = len(summaries)
+    failures = []
+    if pending:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    process_file, input_path, output_directory, output_format
+                ): input_path
+                for input_path in pending
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    summaries.append(future.result())
+                except Exception as error:
+                    failures.append(
+                        {"input": futures[future], "error": f"{error!r}"}
+                    )
+
+    summaries.sort(key=lambda summary: summary["input"])
+    merged = {
+        "files": len(summaries),
+        "skipped": skipped,
+        "failed": failures,
+        "frames": sum(summary["frames"] for summary in summaries),
+        "treadmill_states": sum(summary["treadmill_states"] for summary in summaries),
+        "unknown_frames": sum(summary["unknown_frames"] for summary in summaries),
+        "dropped_frames": sum(summary["dropped_frames"] for summary in summaries),
+        "distance": round(sum(summary["distance"] for summary in summaries), 3),
+        "timer": sum(summary["timer"] for summary in summaries),
+        "sessions": summaries,
+    }
+    _write_json(os.path.join(output_directory, "summary.json"), merged)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-decode capture files in parallel, resuming if interrupted"
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Capture files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "--output_directory",
+        type=str,
+        required=True,
+        help="Directory to which to write one output per capture and summary.json",
+    )
+    parser.add_argument(
+        "--output_format",
+        choices=sorted(writers.WRITERS),
+        default="csv",
+        help="Format of the output data",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        help="Number of worker processes; defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--force",
+        action=argparse.BooleanOptionalAction,
+        help="Whether to reprocess captures that already have an output",
+    )
+    args = parser.parse_args()
+
+    input_paths = find_inputs(args.inputs)
+    summary = reprocess(
+        input_paths,
+        args.output_directory,
+        args.output_format,
+        workers=args.workers,
+        force=args.force,
+    )
+
+    print(
+        f"Processed {summary['files'] - summary['skipped']} captures "
+        f"({summary['skipped']} already done, {len(summary['failed'])} failed): "
+        f"{summary['treadmill_states']} states, "
+        f"{summary['dropped_frames']} dropped frames, "
+        f"{summary['distance']:.3f} miles"
+    )
+    for failure in summary["failed"]:
+        print(f"Failed: {failure['input']}: {failure['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import json
+import os
+import reprocess
+import tempfile
+import unittest
+import writers
+
+# A single treadmill state sequence.
+_PACKETS = [
+    "fe0232040205040502020d0000302a0000000000",
+    "00120104022e042e0202c1002c0171006a170000",
+    "011200000000025502250b00009112a203b4005d",
+    "ff0e0128015802ec022000ec0220009803b4005d",
+]
+
+
+class ReprocessTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self._input_directory = os.path.join(self._directory.name, "captures")
+        self._output_directory = os.path.join(self._directory.name, "output")
+        os.mkdir(self._input_directory)
+
+        for name, repeats in (("a.txt", 1), ("b.txt", 3)):
+            with open(os.path.join(self._input_directory, name), "w") as hex_file:
+                # The second header must carry the previous end packet's
+                # sequence number.
+                first, *rest = _PACKETS
+                hex_file.write(first + "\n")
+                for _ in range(repeats):
+                    hex_file.write("\n".join(rest) + "\n")
+                    hex_file.write("fe02320402" + _PACKETS[-1][8:] + "\n")
+
+    def test_find_inputs(self):
+        self.assertEqual(
+            reprocess.find_inputs([self._input_directory]),
+            reprocess.find_inputs([os.path.join(self._input_directory, "*.txt")]),
+        )
+        self.assertEqual(len(reprocess.find_inputs([self._input_directory])), 2)
+
+    def test_reprocess(self):
+        inputs = reprocess.find_inputs([self._input_directory])
+        summary = reprocess.reprocess(
+            inputs, self._output_directory, "binary", workers=2
+        )
+
+        self.assertEqual(summary["files"], 2)
+        self.assertEqual(summary["skipped"], 0)
+        self.assertEqual(summary["failed"], [])
+        self.assertEqual(summary["treadmill_states"], 4)
+        self.assertEqual(
+            [session["treadmill_states"] for session in summary["sessions"]], [1, 3]
+        )
+
+        rows = list(
+            writers.read_binary(os.path.join(self._output_directory, "b.ngfs"))
+        )
+        self.assertEqual(rows, [(3.0, 1.2, 3.722, 2853)] * 3)
+
+        with open(os.path.join(self._output_directory, "summary.json")) as file:
+            self.assertEqual(json.load(file), summary)
+
+    def test_resume(self):
+        inputs = reprocess.find_inputs([self._input_directory])
+        reprocess.reprocess(inputs[:1], self._output_directory, workers=1)
+
+        summary = reprocess.reprocess(inputs, self._output_directory, workers=1)
+        self.assertEqual(summary["files"], 2)
+        self.assertEqual(summary["skipped"], 1)
+        self.assertEqual(summary["treadmill_states"], 4)
+
+        summary = reprocess.reprocess(
+            inputs, self._output_directory, workers=1, force=True
+        )
+        self.assertEqual(summary["skipped"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
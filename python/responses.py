@@ -1,9 +1,27 @@
 """NongoFit - response utilities.
 
 This contains utilities for converting bytearray data into structured resposes.
+
+Each response type declares its known fields once as a `Schema`, which is
+compiled into a single `struct.Struct` so a payload is decoded with one
+unpack. Response types are registered by type code with `register_response`,
+so new types can be added without touching `parse_response`:
+
+    @responses.register_response(0x1234)
+    class SomeResponse(responses.Response):
+        type = responses.ResponseTypes.SOME_TYPE
+        _SCHEMA = responses.Schema(
+            responses.Field("speed", 1, "H", some_conversion),
+        )
+        __slots__ = _SCHEMA.names
 """
 
 import enum
+import struct
+
+
+# Type code identifying a treadmill state response (see `parse_response`).
+TREADMILL_STATE_CODE = 0x22E042E
 
 
 class ResponseTypes(enum.Enum):
@@ -13,12 +31,169 @@ class ResponseTypes(enum.Enum):
     TREADMILL_STATE = enum.auto()
 
 
-def _to_int(byte_values: bytearray):
-    """Converts `byte_values` into a little-endian integer."""
-    return int.from_bytes(byte_values, byteorder="little")
+# Conversions from the raw integer values to their presented units. These are
+# shared by the per-frame responses below and the batch decoder so both paths
+# produce identical values.
+
+
+def pace_from_int(value: int) -> float:
+    """Pace is a two-byte value representing in kilometers-per-hour.
+
+    Conversion:
+      * Divide by 100 (stored as an integer / presented as a float)
+      * Multiply by 0.621 to convert kilometers to miles
+      * Round to one decimal
+    """
+    return round((value / 100.0) * 0.621, 1)
+
+
+def incline_from_int(value: int) -> float:
+    """Incline is a two-byte value representing the percentage incline.
+
+    Conversion:
+      * Divide by 100
+    """
+    return round(value / 100.0, 1)
+
+
+def distance_from_int(value: int) -> float:
+    """Distance is a two-byte value represented in meters.
+
+    Conversion:
+      * Divide by 1000 to get kilometers
+      * Multiply by 0.621 to convert kilometers to miles
+      * Round to three decimals
+    """
+    return round((value / 1000.0) * 0.621, 3)
+
+
+class Field:
+    """A known value at a fixed offset within a response payload.
+
+    Args:
+      name: attribute name of the decoded value.
+      offset: offset of the value within the payload.
+      format: `struct` format character of the raw value (little-endian).
+      convert: optional function converting the raw value for presentation.
+    """
+
+    __slots__ = ("name", "offset", "format", "size", "convert")
+
+    def __init__(self, name: str, offset: int, format: str, convert=None):
+        self.name = name
+        self.offset = offset
+        self.format = format
+        self.size = struct.calcsize(f"<{format}")
+        self.convert = convert
+
+    @property
+    def slice(self) -> slice:
+        return slice(self.offset, self.offset + self.size)
+
+
+class Schema:
+    """The layout of a response payload, compiled into one `struct.Struct`.
+
+    Gaps between fields become pad bytes, so `unpack` decodes every field with
+    a single call regardless of how many there are.
+    """
+
+    def __init__(self, *fields: Field):
+        self.fields = tuple(sorted(fields, key=lambda field: field.offset))
+        self.names = tuple(field.name for field in self.fields)
+
+        layout = "<"
+        position = 0
+        for field in self.fields:
+            if field.offset < position:
+                raise ValueError(f"Field {field.name} overlaps the previous field")
+            layout += "x" * (field.offset - position) + field.format
+            position = field.offset + field.size
+        self._struct = struct.Struct(layout)
+        self.size = self._struct.size
+
+        # (start, stop) of each field, for `masked_hex`.
+        self._spans = tuple(
+            (field.offset, field.offset + field.size) for field in self.fields
+        )
+
+        # (index, conversion) for the fields that need converting.
+        self._conversions = tuple(
+            (index, field.convert)
+            for index, field in enumerate(self.fields)
+            if field.convert is not None
+        )
 
+    def unpack(self, payload: bytearray) -> list:
+        """Decodes and converts every field, in offset order.
 
-class TreadmillStateResponse:
+        Payloads shorter than the schema are zero-padded, so missing fields
+        decode as zero.
+        """
+        if len(payload) < self.size:
+            payload = bytes(payload).ljust(self.size, b"\0")
+
+        values = list(self._struct.unpack_from(payload))
+        for index, convert in self._conversions:
+            values[index] = convert(values[index])
+        return values
+
+    def masked_hex(self, payload: bytearray) -> str:
+        """Hex representation of `payload` with the known fields blanked out.
+
+        Only the bytes nobody has mapped yet remain visible, e.g. for debug
+        output.
+        """
+        hex_payload = payload.hex()
+        parts = []
+        position = 0
+        for start, stop in self._spans:
+            if start >= len(payload):
+                break
+            stop = min(stop, len(payload))
+            parts.append(hex_payload[2 * position : 2 * start])
+            parts.append("  " * (stop - start))
+            position = stop
+        parts.append(hex_payload[2 * position :])
+        return "".join(parts)
+
+
+class Response:
+    """Base for responses decoded from a `Schema`.
+
+    Subclasses set `type`, `_SCHEMA` and `__slots__ = _SCHEMA.names`; each
+    decoded value becomes an attribute.
+    """
+
+    __slots__ = ("_raw_bytes",)
+
+    type = ResponseTypes.UNKNOWN
+    _SCHEMA = Schema()
+
+    def __init__(self, raw_bytes: bytearray = None):
+        self._raw_bytes = raw_bytes
+        for name, value in zip(self._SCHEMA.names, self._SCHEMA.unpack(raw_bytes)):
+            setattr(self, name, value)
+
+
+# Response classes, keyed by response type code.
+_HANDLERS = {}
+
+
+def register_response(type_code: int):
+    """Class decorator registering a response class for `type_code`."""
+
+    def register(response_class):
+        if type_code in _HANDLERS:
+            raise ValueError(f"Type code {type_code:#x} is already registered")
+        _HANDLERS[type_code] = response_class
+        return response_class
+
+    return register
+
+
+@register_response(TREADMILL_STATE_CODE)
+class TreadmillStateResponse(Response):
     """Response containing the current state of the treadmill.
 
     Example sequence (with device type info stripped):
@@ -34,41 +209,46 @@ class TreadmillStateResponse:
     Pulse (E)nabled
     """
 
+    type = ResponseTypes.TREADMILL_STATE
+
+    _SCHEMA = Schema(
+        Field("pace", 1, "H", pace_from_int),
+        Field("incline", 3, "H", incline_from_int),
+        Field("distance", 7, "H", distance_from_int),
+        Field("pulse", 11, "B"),
+        Field("pulse_enabled", 14, "B", bool),
+        # TODO: Add more info - this is 0x1 in 'normal' mode and '0x7' in
+        # the settings menu (can't trigger other values).
+        # Field("display_mode", 15, "B"),
+        # Timer is kept in seconds - more useful calculations (e.g. displaying
+        # in a human-readable format) can be done by clients.
+        Field("timer", 18, "H"),
+    )
+
+    __slots__ = _SCHEMA.names
+
+    # Slices containing the locations of known data.
+    _slices = {field.name.upper(): field.slice for field in _SCHEMA.fields}
+
+    # Order of the values returned by `to_row`.
+    ROW_FIELDS = ("incline", "pace", "distance", "timer")
+
     def __init__(self, raw_bytes: bytearray = None):
+        # Unrolled version of `Response.__init__`; this is the hot path.
         self._raw_bytes = raw_bytes
-        self.type = ResponseTypes.TREADMILL_STATE
-
-        # Slices containing the locations of known data.
-        self._slices = {
-            "PACE": slice(1, 3),
-            "INCLINE": slice(3, 5),
-            "DISTANCE": slice(7, 9),
-            "PULSE": slice(11, 12),
-            "PULSE_ENABLED": slice(14, 15),
-            # TODO: Add more info - this is 0x1 in 'normal' mode and '0x7' in
-            # the settings menu (can't trigger other values).
-            #'DISPLAY_MODE': slice(15, 16),
-            "TIMER": slice(18, 20),
-        }
-
-        self.pace = self._extract_pace(raw_bytes)
-        self.incline = self._extract_incline(raw_bytes)
-        self.distance = self._extract_distance(raw_bytes)
-        self.timer = self._extract_timer(raw_bytes)
-        self.pulse = _to_int(raw_bytes[self._slices["PULSE"]])
-        self.pulse_enabled = bool(_to_int(raw_bytes[self._slices["PULSE_ENABLED"]]))
+        (
+            self.pace,
+            self.incline,
+            self.distance,
+            self.pulse,
+            self.pulse_enabled,
+            self.timer,
+        ) = self._SCHEMA.unpack(raw_bytes)
 
     def debug_string(self):
         """Prints a representation suitable for logging/debugging."""
-        masks = set()
-        for data_slice in self._slices.values():
-            masks.update(range(data_slice.start, data_slice.stop))
-
         # 'Erase' all bytes that are already known.
-        masked_bytes = "".join(
-            "  " if index in masks else f"{byte_:0>2x}"
-            for index, byte_ in enumerate(self._raw_bytes)
-        )
+        masked_bytes = self._SCHEMA.masked_hex(self._raw_bytes)
 
         spacer = " " * 4
         return (
@@ -81,6 +261,13 @@ class TreadmillStateResponse:
             f"{masked_bytes}"
         )
 
+    def to_row(self):
+        """Converts the response into a tuple ordered like `ROW_FIELDS`.
+
+        Cheaper than `to_dict` for writers that handle many rows at once.
+        """
+        return (self.incline, self.pace, self.distance, self.timer)
+
     def to_dict(self):
         """Surprise: this converts the response into a dictionary."""
         return {
@@ -90,64 +277,26 @@ class TreadmillStateResponse:
             "timer": self.timer,
         }
 
-    def _extract_pace(self, byte_values: bytearray):
-        """Pace is a two-byte value representing in kilometers-per-hour.
-
-        Conversion:
-          * Convert the bytes to a little-endian integer
-          * Divide by 100 (stored as an integer / presented as a float)
-          * Multiply by 0.621 to convert kilometers to miles
-          * Round to one decimal
-        """
-        return round((_to_int(byte_values[self._slices["PACE"]]) / 100.0) * 0.621, 1)
-
-    def _extract_incline(self, byte_values: bytearray):
-        """Incline is a two-byte value representing the percentage incline.
-
-        Conversion:
-          * Convert the bytes to a little-endian integer
-          * Divide by 100
-        """
-        return round((_to_int(byte_values[self._slices["INCLINE"]]) / 100.0), 1)
-
-    def _extract_distance(self, byte_values: bytearray):
-        """Distance is a two-byte value represented in meters.
-
-        Conversion:
-          * Convert the bytes to a little-endian integer
-          * Divide by 1000 to get kilometers
-          * Multiply by 0.621 to convert kilometers to miles
-          * Round to three decimals
-        """
-        return round(
-            (_to_int(byte_values[self._slices["DISTANCE"]]) / 1000.0) * 0.621, 3
-        )
-
-    def _extract_timer(self, byte_values: bytearray):
-        """Timer is a two-byte value represented in seconds.
-
-        Conversion:
-          * Convert the bytes to a little-endian integer (that was simple)
-
-        Note that for the purpose of this the value is kept in seconds - more
-        useful calculations (e.g. displaying in a human-readable format) can be
-        done by clients.
-        """
-        return _to_int(byte_values[self._slices["TIMER"]])
-
 
 class UnknownResponse:
     """Default handler for something we don't yet understand."""
 
+    __slots__ = ("raw_bytes",)
+
+    type = ResponseTypes.UNKNOWN
+
     def __init__(self, raw_bytes: bytearray = None):
         self.raw_bytes = raw_bytes
-        self.type = ResponseTypes.UNKNOWN
 
     def debug_string(self):
         # return f'(UnknownResponse)  {self.raw_bytes.hex()}'
         return f"{self.raw_bytes.hex()}"
 
 
+# Device info (three bytes) followed by the response type code.
+_PREFIX = struct.Struct("<3xI")
+
+
 def parse_response(response_data: bytearray):
     """Parses raw response data into a structured response.
 
@@ -161,15 +310,12 @@ def parse_response(response_data: bytearray):
 
     Note: this assumes the packet headers (packet num/size) have been pruned.
     """
+    if len(response_data) < _PREFIX.size:
+        return UnknownResponse(response_data)
+
     # Device info most likely allows mapping to different functionality based on
     # the device type (treadmill, bike, unicycle). Ignore for now.
-    device_info = response_data[:3]
-    response_type = int.from_bytes(response_data[3:7], byteorder="little")
-
-    # Keep the raw byte stuff simple/local rather than make a module-level dict.
-    if response_type == 0x22E042E:
-        handler = TreadmillStateResponse
-    else:
-        handler = UnknownResponse
+    (response_type,) = _PREFIX.unpack_from(response_data)
 
-    return handler(response_data[7:])
+    handler = _HANDLERS.get(response_type, UnknownResponse)
+    return handler(response_data[_PREFIX.size :])
@@ -0,0 +1,107 @@
+import responses
+import unittest
+
+# Full treadmill state frame (device info, type and payload).
+_STATE_FRAME = bytes.fromhex(
+    "0104022e042e0202c1002c0171006a17000000000000025502250b00009112a203b4005d"
+    "0128015802ec022000ec022000"
+)
+
+
+class ResponsesTest(unittest.TestCase):
+    def test_treadmill_state(self):
+        response = responses.parse_response(_STATE_FRAME)
+
+        self.assertIsInstance(response, responses.TreadmillStateResponse)
+        self.assertEqual(response.type, responses.ResponseTypes.TREADMILL_STATE)
+        self.assertEqual(
+            response.to_dict(),
+            {"pace": 1.2, "incline": 3.0, "distance": 3.722, "timer": 2853},
+        )
+        self.assertEqual(response.to_row(), (3.0, 1.2, 3.722, 2853))
+        self.assertEqual(response.pulse, 0)
+        self.assertFalse(response.pulse_enabled)
+
+    def test_treadmill_state_has_no_dict(self):
+        response = responses.parse_response(_STATE_FRAME)
+        with self.assertRaises(AttributeError):
+            response.__dict__
+
+    def test_short_payload_decodes_as_zero(self):
+        response = responses.TreadmillStateResponse(bytes.fromhex("02c100"))
+        self.assertEqual(response.pace, 1.2)
+        self.assertEqual(response.timer, 0)
+
+    def test_debug_string_masks_known_fields(self):
+        response = responses.parse_response(_STATE_FRAME)
+        payload = _STATE_FRAME[7:]
+        known = set()
+        for data_slice in responses.TreadmillStateResponse._slices.values():
+            known.update(range(data_slice.start, data_slice.stop))
+
+        self.assertTrue(
+            response.debug_string().endswith(
+                "".join(
+                    "  " if index in known else f"{byte_:02x}"
+                    for index, byte_ in enumerate(payload)
+                )
+            )
+        )
+        # Payloads ending within a field.
+        self.assertEqual(
+            responses.TreadmillStateResponse._SCHEMA.masked_hex(payload[:2]), "02  "
+        )
+
+    def test_unknown(self):
+        response = responses.parse_response(bytes.fromhex("0104022e0400000102"))
+
+        self.assertIsInstance(response, responses.UnknownResponse)
+        self.assertEqual(response.debug_string(), "0102")
+
+    def test_slices(self):
+        self.assertEqual(
+            responses.TreadmillStateResponse._slices,
+            {
+                "PACE": slice(1, 3),
+                "INCLINE": slice(3, 5),
+                "DISTANCE": slice(7, 9),
+                "PULSE": slice(11, 12),
+                "PULSE_ENABLED": slice(14, 15),
+                "TIMER": slice(18, 20),
+            },
+        )
+
+    def test_schema(self):
+        schema = responses.Schema(
+            responses.Field("b", 4, "H", lambda value: value * 2),
+            responses.Field("a", 1, "B"),
+        )
+
+        self.assertEqual(schema.names, ("a", "b"))
+        self.assertEqual(schema.size, 6)
+        self.assertEqual(schema.unpack(bytes.fromhex("000700000100")), [7, 2])
+
+    def test_schema_overlap(self):
+        with self.assertRaises(ValueError):
+            responses.Schema(
+                responses.Field("a", 0, "H"), responses.Field("b", 1, "B")
+            )
+
+    def test_register_response(self):
+        @responses.register_response(0x12345678)
+        class TestResponse(responses.Response):
+            _SCHEMA = responses.Schema(responses.Field("value", 0, "H"))
+            __slots__ = _SCHEMA.names
+
+        self.addCleanup(responses._HANDLERS.pop, 0x12345678)
+
+        response = responses.parse_response(bytes.fromhex("01040278563412ff01"))
+        self.assertIsInstance(response, TestResponse)
+        self.assertEqual(response.value, 0x1FF)
+
+        with self.assertRaises(ValueError):
+            responses.register_response(0x12345678)(TestResponse)
+
+
+if __name__ == "__main__":
+    unittest.main()
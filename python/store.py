@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+"""NongoFit - SQLite session store.
+
+Stores treadmill state samples from every session in a single SQLite
+database, so questions spanning sessions don't need to scan one CSV per run:
+
+    sessions  one row per session, with rollups (sample count, duration,
+              distance, maximum/average pace and incline) that are updated as
+              samples are written
+    samples   one row per treadmill state, indexed by (session, timer)
+
+Samples are inserted in batches, one transaction per batch, with the database
+in WAL mode so queries can run while a session is being recorded. Use
+`--output_format=sqlite` to record into `<output_directory>/nongofit.sqlite`.
+
+Aggregate queries only read the `sessions` rollups, e.g.:
+
+    ./store.py /some/path/nongofit.sqlite totals --since=2024-05-01
+    ./store.py /some/path/nongofit.sqlite sessions --min_incline=8
+"""
+
+import argparse
+import datetime
+import responses
+import sqlite3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    ended TEXT NOT NULL,
+    device TEXT,
+    samples INTEGER NOT NULL DEFAULT 0,
+    duration INTEGER NOT NULL DEFAULT 0,
+    distance REAL NOT NULL DEFAULT 0,
+    max_pace REAL NOT NULL DEFAULT 0,
+    max_incline REAL NOT NULL DEFAULT 0,
+    pace_sum REAL NOT NULL DEFAULT 0,
+    incline_sum REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started);
+
+CREATE TABLE IF NOT EXISTS samples (
+    session INTEGER NOT NULL REFERENCES sessions (id),
+    timer INTEGER NOT NULL,
+    incline REAL NOT NULL,
+    pace REAL NOT NULL,
+    distance REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_session_timer ON samples (session, timer);
+"""
+
+# Columns of untagged and tagged rows (see `writers`).
+_FIELDS = responses.TreadmillStateResponse.ROW_FIELDS
+_TAGGED_FIELDS = ("device",) + _FIELDS
+
+
+def connect(path: str, **kwargs) -> sqlite3.Connection:
+    """Opens (creating if needed) the store at `path`."""
+    connection = sqlite3.connect(path, **kwargs)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    # WAL makes NORMAL durable against application crashes.
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+class SqliteWriter:
+    """Writes rows into the store, one session per run (and device).
+
+    Unlike the file formats, every run writes to the same database; see
+    `filename`. Rows may be tagged with their device (`writers.TAGGED_FIELDS`), in
+    which case each device gets its own session.
+    """
+
+    extension = ".sqlite"
+
+    # Name of the database within the output directory (see
+    # `writers.open_writer`).
+    filename = "nongofit.sqlite"
+
+    def __init__(self, path: str, fields: tuple = _FIELDS):
+        fields = tuple(fields)
+        if fields not in (_FIELDS, _TAGGED_FIELDS):
+            raise ValueError(f"Unsupported fields for the sqlite format: {fields}")
+        self._tagged = fields == _TAGGED_FIELDS
+
+        # Rows are written from the `BackgroundWriter` thread.
+        self._connection = connect(path, check_same_thread=False)
+        # Session IDs, by device (None if untagged).
+        self._sessions = {}
+
+    def _session(self, device: str) -> int:
+        if (session := self._sessions.get(device)) is None:
+            now = _now()
+            session = self._connection.execute(
+                "INSERT INTO sessions (started, ended, device) VALUES (?, ?, ?)",
+                (now, now, device),
+            ).lastrowid
+            self._sessions[device] = session
+        return session
+
+    def write_rows(self, rows: list):
+        if self._tagged:
+            by_device = {}
+            for device, *row in rows:
+                by_device.setdefault(device, []).append(row)
+        else:
+            by_device = {None: rows}
+
+        ended = _now()
+        with self._connection:
+            for device, device_rows in by_device.items():
+                session = self._session(device)
+                self._connection.executemany(
+                    "INSERT INTO samples (session, incline, pace, distance, timer) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(session, *row) for row in device_rows],
+                )
+
+                inclines, paces, distances, timers = zip(*device_rows)
+                self._connection.execute(
+                    """
+                    UPDATE sessions SET
+                        ended = ?,
+                        samples = samples + ?,
+                        duration = MAX(duration, ?),
+                        distance = MAX(distance, ?),
+                        max_pace = MAX(max_pace, ?),
+                        max_incline = MAX(max_incline, ?),
+                        pace_sum = pace_sum + ?,
+                        incline_sum = incline_sum + ?
+                    WHERE id = ?
+                    """,
+                    (
+                        ended,
+                        len(device_rows),
+                        max(timers),
+                        max(distances),
+                        max(paces),
+                        max(inclines),
+                        sum(paces),
+                        sum(inclines),
+                        session,
+                    ),
+                )
+
+    def close(self):
+        self._connection.close()
+
+
+def _filters(since: str = None, until: str = None, min_incline: float = None):
+    """Builds a WHERE clause (and its parameters) over the `sessions` table."""
+    clauses, parameters = [], []
+    if since is not None:
+        clauses.append("started >= ?")
+        parameters.append(since)
+    if until is not None:
+        clauses.append("started < ?")
+        parameters.append(until)
+    if min_incline is not None:
+        clauses.append("max_incline >= ?")
+        parameters.append(min_incline)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, parameters
+
+
+def totals(connection, since: str = None, until: str = None) -> dict:
+    """Totals over the sessions started in [since, until)."""
+    where, parameters = _filters(since, until)
+    row = connection.execute(
+        f"""
+        SELECT
+            COUNT(*) AS sessions,
+            COALESCE(SUM(samples), 0) AS samples,
+            COALESCE(SUM(distance), 0) AS distance,
+            COALESCE(SUM(duration), 0) AS duration,
+            COALESCE(MAX(max_incline), 0) AS max_incline
+        FROM sessions {where}
+        """,
+        parameters,
+    ).fetchone()
+    return dict(row)
+
+
+def find_sessions(
+    connection, since: str = None, until: str = None, min_incline: float = None
+) -> list:
+    """Rollups of the sessions matching the filters, oldest first."""
+    where, parameters = _filters(since, until, min_incline)
+    rows = connection.execute(
+        f"""
+        SELECT
+            id, started, ended, device, samples, duration, distance, max_pace,
+            max_incline,
+            CASE WHEN samples THEN pace_sum / samples ELSE 0 END AS average_pace,
+            CASE WHEN samples THEN incline_sum / samples ELSE 0 END
+                AS average_incline
+        FROM sessions {where}
+        ORDER BY started, id
+        """,
+        parameters,
+    )
+    return [dict(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the NongoFit session store")
+    parser.add_argument("database", help="Path to the store (nongofit.sqlite)")
+    parser.add_argument(
+        "query",
+        choices=("totals", "sessions"),
+        help="totals: totals over the matching sessions; "
+        "sessions: one line per matching session",
+    )
+    parser.add_argument(
+        "--since",
+        type=str,
+        required=False,
+        help="Only include sessions started on or after this date (YYYY-mm-dd)",
+    )
+    parser.add_argument(
+        "--until",
+        type=str,
+        required=False,
+        help="Only include sessions started before this date (YYYY-mm-dd)",
+    )
+    parser.add_argument(
+        "--min_incline",
+        type=float,
+        required=False,
+        help="Only include sessions reaching at least this incline (sessions only)",
+    )
+    args = parser.parse_args()
+
+    connection = connect(args.database)
+    if args.query == "totals":
+        result = totals(connection, args.since, args.until)
+        print(
+            f"{result['sessions']} sessions, {result['distance']:.3f} miles, "
+            f"{datetime.timedelta(seconds=result['duration'])}, "
+            f"max incline {result['max_incline']}%"
+        )
+    else:
+        for session in find_sessions(
+            connection, args.since, args.until, args.min_incline
+        ):
+            print(
+                f"{session['id']:>5}  {session['started']}  "
+                f"{session['distance']:7.3f} miles  "
+                f"{datetime.timedelta(seconds=session['duration'])}  "
+                f"avg {session['average_pace']:.1f} mph  "
+                f"max {session['max_incline']}% incline"
+                + (f"  {session['device']}" if session["device"] else "")
+            )
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import store
+import tempfile
+import unittest
+
+_ROWS = [
+    (0.0, 1.2, 0.013, 1),
+    (1.5, 3.7, 0.021, 2),
+    (12.0, 6.2, 1.234, 3),
+]
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self._path = os.path.join(self._directory.name, "nongofit.sqlite")
+
+    def _connect(self):
+        connection = store.connect(self._path)
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_rollups(self):
+        writer = store.SqliteWriter(self._path)
+        writer.write_rows(_ROWS[:2])
+        writer.write_rows(_ROWS[2:])
+        writer.close()
+
+        connection = self._connect()
+        (session,) = store.find_sessions(connection)
+        self.assertEqual(session["samples"], 3)
+        self.assertEqual(session["duration"], 3)
+        self.assertEqual(session["distance"], 1.234)
+        self.assertEqual(session["max_pace"], 6.2)
+        self.assertEqual(session["max_incline"], 12.0)
+        self.assertAlmostEqual(session["average_pace"], 11.1 / 3)
+        self.assertIsNone(session["device"])
+
+        samples = connection.execute(
+            "SELECT incline, pace, distance, timer FROM samples ORDER BY timer"
+        ).fetchall()
+        self.assertEqual([tuple(sample) for sample in samples], _ROWS)
+
+    def test_sessions_per_run_and_device(self):
+        writer = store.SqliteWriter(self._path)
+        writer.write_rows(_ROWS[:1])
+        writer.close()
+
+        writer = store.SqliteWriter(self._path, fields=("device",) + store._FIELDS)
+        writer.write_rows([("a",) + _ROWS[0], ("b",) + _ROWS[1], ("a",) + _ROWS[2]])
+        writer.close()
+
+        connection = self._connect()
+        sessions = store.find_sessions(connection)
+        self.assertEqual(
+            [(session["device"], session["samples"]) for session in sessions],
+            [(None, 1), ("a", 2), ("b", 1)],
+        )
+
+        sessions = store.find_sessions(connection, min_incline=8)
+        self.assertEqual([session["device"] for session in sessions], ["a"])
+
+        result = store.totals(connection)
+        self.assertEqual(result["sessions"], 3)
+        self.assertAlmostEqual(result["distance"], 0.013 + 1.234 + 0.021)
+        self.assertEqual(store.totals(connection, since="9999-01-01")["sessions"], 0)
+
+    def test_wal(self):
+        store.SqliteWriter(self._path).close()
+        connection = self._connect()
+        self.assertEqual(
+            connection.execute("PRAGMA journal_mode").fetchone()[0], "wal"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
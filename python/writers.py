@@ -0,0 +1,374 @@
+"""NongoFit - output writers.
+
+Writers persist treadmill state rows (tuples ordered like
+`TreadmillStateResponse.ROW_FIELDS`, see `to_row`). Each format writes whole
+batches of rows at a time, and `BackgroundWriter` collects rows from the packet
+loop and hands them to a format writer on a separate thread, so a slow disk
+never stalls packet consumption.
+
+Example usage:
+
+    with writers.open_writer('csv', '/some/path') as writer:
+        for response_data in reader.responses():
+            ...
+            writer.write(response.to_row())
+
+Available formats are listed in `WRITERS`. Writers accept a `fields` argument
+for rows with extra leading columns, e.g. `TAGGED_FIELDS` for rows tagged with
+the device they came from.
+"""
+
+import collections
+import csv
+import datetime
+import metrics
+import os
+import responses
+import store
+import struct
+import threading
+import time
+
+# Names of the columns in each row.
+FIELDS = responses.TreadmillStateResponse.ROW_FIELDS
+
+# Columns of rows tagged with the address of the device they came from.
+TAGGED_FIELDS = ("device",) + FIELDS
+
+
+class CsvWriter:
+    """Writes rows as CSV with a header line."""
+
+    extension = ".csv"
+
+    def __init__(self, path: str, fields: tuple = FIELDS):
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(fields)
+
+    def write_rows(self, rows: list):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BinaryWriter:
+    """Writes rows as fixed-width little-endian records.
+
+    The file starts with `MAGIC`, followed by one `RECORD` per row:
+
+        incline (double) pace (double) distance (double) timer (uint16)
+
+    Use `read_binary` to read the rows back. Only untagged rows (`FIELDS`) are
+    supported.
+    """
+
+    extension = ".ngfs"
+
+    MAGIC = b"NGFS\x01"
+    RECORD = struct.Struct("<dddH")
+
+    def __init__(self, path: str, fields: tuple = FIELDS):
+        if tuple(fields) != FIELDS:
+            raise ValueError(f"The binary output format only supports {FIELDS}")
+        self._file = open(path, "wb")
+        self._file.write(self.MAGIC)
+
+    def write_rows(self, rows: list):
+        pack = self.RECORD.pack
+        self._file.write(b"".join([pack(*row) for row in rows]))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_binary(path: str):
+    """Yields the rows of a file written by `BinaryWriter`."""
+    with open(path, "rb") as binary_file:
+        data = binary_file.read()
+
+    if not data.startswith(BinaryWriter.MAGIC):
+        raise ValueError(f"{path} was not written by BinaryWriter")
+
+    yield from BinaryWriter.RECORD.iter_unpack(
+        memoryview(data)[len(BinaryWriter.MAGIC) :]
+    )
+
+
+class ChangesWriter:
+    """Writes rows run-length encoded, one CSV line per change of state.
+
+    Treadmill state rarely changes between samples: pace and incline stay
+    fixed for minutes while only the clock fields (`distance` and `timer`)
+    move. Consecutive rows with the same incline and pace are therefore
+    collapsed into a single run:
+
+        incline,pace,start_timer,end_timer,start_distance,end_distance,samples
+
+    A run also ends if the clock goes backwards (e.g. a new workout). Use
+    `read_changes` to expand the runs back into one row per sample; the first
+    and last row of each run are exact, the clock fields of the rows between
+    are interpolated.
+
+    Note that the current run is only written once it ends (or on `close`).
+    Only untagged rows (`FIELDS`) are supported.
+    """
+
+    extension = ".changes.csv"
+
+    COLUMNS = (
+        "incline",
+        "pace",
+        "start_timer",
+        "end_timer",
+        "start_distance",
+        "end_distance",
+        "samples",
+    )
+
+    def __init__(self, path: str, fields: tuple = FIELDS):
+        if tuple(fields) != FIELDS:
+            raise ValueError(f"The changes output format only supports {FIELDS}")
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.COLUMNS)
+
+        # [incline, pace, start_timer, end_timer, start_distance, end_distance,
+        # samples] of the current run.
+        self._run = None
+
+    def write_rows(self, rows: list):
+        run = self._run
+        runs = []
+        for incline, pace, distance, timer in rows:
+            if (
+                run is not None
+                and incline == run[0]
+                and pace == run[1]
+                and timer >= run[3]
+                and distance >= run[5]
+            ):
+                run[3] = timer
+                run[5] = distance
+                run[6] += 1
+                continue
+
+            if run is not None:
+                runs.append(run)
+            run = [incline, pace, timer, timer, distance, distance, 1]
+        self._run = run
+
+        if runs:
+            self._writer.writerows(runs)
+            self._file.flush()
+
+    def close(self):
+        if self._run is not None:
+            self._writer.writerow(self._run)
+            self._run = None
+        self._file.close()
+
+
+def read_changes(path: str):
+    """Yields one row per sample of a file written by `ChangesWriter`."""
+    with open(path, newline="") as changes_file:
+        reader = csv.reader(changes_file)
+        if tuple(next(reader, ())) != ChangesWriter.COLUMNS:
+            raise ValueError(f"{path} was not written by ChangesWriter")
+
+        for line in reader:
+            incline, pace = float(line[0]), float(line[1])
+            start_timer, end_timer = int(line[2]), int(line[3])
+            start_distance, end_distance = float(line[4]), float(line[5])
+            samples = int(line[6])
+
+            # Interpolate the clock fields of the samples within the run.
+            timer_step = (end_timer - start_timer) / max(samples - 1, 1)
+            distance_step = (end_distance - start_distance) / max(samples - 1, 1)
+            for index in range(samples - 1):
+                yield (
+                    incline,
+                    pace,
+                    round(start_distance + distance_step * index, 3),
+                    start_timer + round(timer_step * index),
+                )
+            yield (incline, pace, end_distance, end_timer)
+
+
+class _ArrowWriter:
+    """Base for writers backed by pyarrow (imported only when used)."""
+
+    def __init__(self, path: str, fields: tuple = FIELDS):
+        try:
+            import pyarrow
+        except ImportError as error:
+            raise RuntimeError(
+                f"The {self.extension} output format requires pyarrow"
+            ) from error
+
+        types = {
+            "device": pyarrow.string(),
+            "timer": pyarrow.uint16(),
+        }
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema(
+            [(name, types.get(name, pyarrow.float64())) for name in fields]
+        )
+        self._writer = self._open(path)
+
+    def write_rows(self, rows: list):
+        columns = [list(column) for column in zip(*rows)]
+        self._writer.write_batch(
+            self._pyarrow.record_batch(columns, schema=self._schema)
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+class ParquetWriter(_ArrowWriter):
+    """Writes rows to a Parquet file, one row group per batch."""
+
+    extension = ".parquet"
+
+    def _open(self, path: str):
+        import pyarrow.parquet
+
+        return pyarrow.parquet.ParquetWriter(path, self._schema)
+
+
+class ArrowWriter(_ArrowWriter):
+    """Writes rows to an Arrow IPC file, one record batch per batch."""
+
+    extension = ".arrow"
+
+    def _open(self, path: str):
+        import pyarrow.ipc
+
+        return pyarrow.ipc.new_file(path, self._schema)
+
+
+# Output formats, by name.
+WRITERS = {
+    "csv": CsvWriter,
+    "binary": BinaryWriter,
+    "changes": ChangesWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowWriter,
+    "sqlite": store.SqliteWriter,
+}
+
+
+class BackgroundWriter:
+    """Buffers rows and writes them in batches on a background thread.
+
+    `write` only appends to a queue; the background thread flushes queued rows
+    to the underlying writer once `batch_size` rows are waiting or every
+    `flush_interval` seconds, whichever comes first. Remaining rows are flushed
+    on `close`.
+
+    Note that the queue is unbounded: if the disk cannot keep up, rows are
+    held in memory rather than blocking the caller.
+
+    Args:
+      writer: a format writer (e.g. `CsvWriter`).
+      batch_size: number of queued rows that triggers a flush.
+      flush_interval: maximum number of seconds between flushes.
+    """
+
+    def __init__(self, writer, batch_size: int = 1024, flush_interval: float = 1.0):
+        self._writer = writer
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+
+        # deque appends/pops are thread-safe, so no lock is needed.
+        self._rows = collections.deque()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        # Set if the background thread fails; re-raised on `close`.
+        self._error = None
+
+        # Flushes happen off the packet loop, so they are always timed.
+        self.flush_seconds = metrics.Histogram(
+            "nongofit_writer_flush_seconds", "Time taken to write a batch of rows"
+        )
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, row: tuple):
+        """Queues `row` for writing."""
+        self._rows.append(row)
+        if len(self._rows) >= self._batch_size:
+            self._wakeup.set()
+
+    def pending_rows(self) -> int:
+        """Number of rows queued but not yet written."""
+        return len(self._rows)
+
+    def close(self):
+        """Flushes any remaining rows and closes the underlying writer."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self._writer.close()
+
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        try:
+            while True:
+                self._wakeup.wait(self._flush_interval)
+                self._wakeup.clear()
+                # Read before flushing so rows queued ahead of `close` are
+                # written.
+                closed = self._closed
+                self._flush()
+                if closed:
+                    return
+        except Exception as error:
+            self._error = error
+
+    def _flush(self):
+        rows = self._rows
+        if batch := [rows.popleft() for _ in range(len(rows))]:
+            start = time.perf_counter()
+            self._writer.write_rows(batch)
+            self.flush_seconds.observe(time.perf_counter() - start)
+
+
+def open_writer(
+    output_format: str, output_directory: str, fields: tuple = FIELDS, **kwargs
+):
+    """Opens a `BackgroundWriter` for a new session in `output_directory`.
+
+    The file is named YYYYmmdd_HHMMSS with the format's extension, unless the
+    format has a fixed `filename` shared by all sessions (e.g. sqlite).
+
+    Args:
+      output_format: name of the format (a key of `WRITERS`).
+      output_directory: directory in which to create the file.
+      fields: names of the columns in each row.
+      **kwargs: passed to `BackgroundWriter`.
+    """
+    writer_class = WRITERS[output_format]
+    filename = getattr(
+        writer_class,
+        "filename",
+        f"{datetime.datetime.now():%Y%m%d_%H%M%S}{writer_class.extension}",
+    )
+    path = os.path.join(output_directory, filename)
+    return BackgroundWriter(writer_class(path, fields), **kwargs)
@@ -0,0 +1,161 @@
+import csv
+import os
+import tempfile
+import threading
+import time
+import unittest
+import writers
+
+try:
+    import pyarrow
+except ImportError:  # pyarrow is optional.
+    pyarrow = None
+
+_ROWS = [
+    (0.0, 1.2, 0.013, 1),
+    (1.5, 3.7, 0.021, 2),
+    (12.0, 6.2, 1.234, 65535),
+]
+
+
+class _RecordingWriter:
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+        self.flushed = threading.Event()
+
+    def write_rows(self, rows):
+        self.batches.append(rows)
+        self.flushed.set()
+
+    def close(self):
+        self.closed = True
+
+
+class WritersTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self._path = os.path.join(self._directory.name, "output")
+
+    def test_csv(self):
+        writer = writers.CsvWriter(self._path)
+        writer.write_rows(_ROWS)
+        writer.close()
+
+        with open(self._path, newline="") as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(rows[0], ["incline", "pace", "distance", "timer"])
+        self.assertEqual(rows[1:], [[str(value) for value in row] for row in _ROWS])
+
+    def test_csv_tagged(self):
+        writer = writers.CsvWriter(self._path, fields=writers.TAGGED_FIELDS)
+        writer.write_rows([("C0:FF:EE:00:00:01",) + _ROWS[0]])
+        writer.close()
+
+        with open(self._path, newline="") as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(rows[0], list(writers.TAGGED_FIELDS))
+        self.assertEqual(rows[1][0], "C0:FF:EE:00:00:01")
+
+    def test_binary_rejects_other_fields(self):
+        with self.assertRaises(ValueError):
+            writers.BinaryWriter(self._path, fields=writers.TAGGED_FIELDS)
+
+    def test_binary(self):
+        writer = writers.BinaryWriter(self._path)
+        writer.write_rows(_ROWS[:1])
+        writer.write_rows(_ROWS[1:])
+        writer.close()
+
+        self.assertEqual(list(writers.read_binary(self._path)), _ROWS)
+
+    def test_changes(self):
+        rows = [(1.0, 3.0, round(0.001 * timer, 3), timer) for timer in range(10)]
+        rows += [(2.0, 3.0, 0.01, 10), (2.0, 3.0, 0.011, 11)]
+        # Timer reset (new workout) with unchanged incline and pace.
+        rows += [(2.0, 3.0, 0.0, 0), (2.0, 3.0, 0.001, 1)]
+
+        writer = writers.ChangesWriter(self._path)
+        writer.write_rows(rows[:5])
+        writer.write_rows(rows[5:])
+        writer.close()
+
+        with open(self._path, newline="") as csv_file:
+            self.assertEqual(len(list(csv_file)), 4)
+        self.assertEqual(list(writers.read_changes(self._path)), rows)
+
+    def test_changes_interpolates_clock(self):
+        writer = writers.ChangesWriter(self._path)
+        writer.write_rows([(0.0, 3.0, 0.1, 1), (0.0, 3.0, 0.1, 1), (0.0, 3.0, 0.2, 5)])
+        writer.close()
+
+        self.assertEqual(
+            list(writers.read_changes(self._path)),
+            [(0.0, 3.0, 0.1, 1), (0.0, 3.0, 0.15, 3), (0.0, 3.0, 0.2, 5)],
+        )
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet(self):
+        import pyarrow.parquet
+
+        writer = writers.ParquetWriter(self._path)
+        writer.write_rows(_ROWS)
+        writer.close()
+
+        table = pyarrow.parquet.read_table(self._path)
+        self.assertEqual(table.column_names, list(writers.FIELDS))
+        self.assertEqual([tuple(row.values()) for row in table.to_pylist()], _ROWS)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow(self):
+        import pyarrow.ipc
+
+        writer = writers.ArrowWriter(self._path)
+        writer.write_rows(_ROWS)
+        writer.close()
+
+        table = pyarrow.ipc.open_file(self._path).read_all()
+        self.assertEqual([tuple(row.values()) for row in table.to_pylist()], _ROWS)
+
+    def test_background_flushes_on_close(self):
+        recorder = _RecordingWriter()
+        with writers.BackgroundWriter(recorder, flush_interval=60) as writer:
+            for row in _ROWS:
+                writer.write(row)
+
+        self.assertEqual(recorder.batches, [_ROWS])
+        self.assertTrue(recorder.closed)
+
+    def test_background_flushes_full_batches(self):
+        recorder = _RecordingWriter()
+        writer = writers.BackgroundWriter(recorder, batch_size=2, flush_interval=60)
+        for row in _ROWS[:2]:
+            writer.write(row)
+
+        self.assertTrue(recorder.flushed.wait(5))
+        self.assertEqual(recorder.batches, [_ROWS[:2]])
+        writer.close()
+
+    def test_background_flushes_on_interval(self):
+        recorder = _RecordingWriter()
+        writer = writers.BackgroundWriter(recorder, flush_interval=0.01)
+        writer.write(_ROWS[0])
+
+        self.assertTrue(recorder.flushed.wait(5))
+        self.assertEqual(recorder.batches, [_ROWS[:1]])
+        writer.close()
+
+    def test_background_errors_are_raised_on_close(self):
+        recorder = _RecordingWriter()
+        recorder.write_rows = lambda rows: 1 / 0
+        writer = writers.BackgroundWriter(recorder, flush_interval=0.01)
+        writer.write(_ROWS[0])
+        time.sleep(0.05)
+
+        with self.assertRaises(ZeroDivisionError):
+            writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()